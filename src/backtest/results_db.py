@@ -0,0 +1,246 @@
+# src/backtest/results_db.py
+# Helyi, indexelt eredménytár a tuning/backtest futásokhoz (SQLite, WAL).
+# Egy sor = egy kiértékelt beállítás (asset, tf, model, variant, th, ...) metrikákkal;
+# az azonos futáshoz tartozó sorok közös `batch` azonosítót kapnak. Az equity
+# görbék parquet-fájlokba kerülnek, a DB csak az útvonalat tárolja.
+# A `batches` tábla futásonként a legjobb sort tartja (insertkor upsert), így a
+# "legjobb küszöb az utolsó N futásból" lekérdezés csak futásnyi sort érint.
+from __future__ import annotations
+import json
+import pathlib
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+import pandas as pd
+from loguru import logger
+
+DB_PATH = pathlib.Path("reports/results.db")
+EQUITY_DIR = pathlib.Path("reports/equity")
+
+COLUMNS = ["batch", "ts", "kind", "asset", "tf", "model", "variant", "th", "hold", "fee_bps",
+           "sharpe", "total_ret", "max_dd", "trades", "p_value", "dsr", "equity_path", "params"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY,
+    batch       TEXT NOT NULL,
+    ts          REAL NOT NULL,
+    kind        TEXT NOT NULL,
+    asset       TEXT NOT NULL,
+    tf          TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    variant     TEXT,
+    th          REAL,
+    hold        REAL,
+    fee_bps     REAL,
+    sharpe      REAL,
+    total_ret   REAL,
+    max_dd      REAL,
+    trades      INTEGER,
+    p_value     REAL,
+    dsr         REAL,
+    equity_path TEXT,
+    params      TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_lookup ON runs (kind, model, asset, tf, ts);
+CREATE INDEX IF NOT EXISTS runs_batch ON runs (batch);
+CREATE TABLE IF NOT EXISTS batches (
+    batch   TEXT NOT NULL,
+    kind    TEXT NOT NULL,
+    asset   TEXT NOT NULL,
+    tf      TEXT NOT NULL,
+    model   TEXT NOT NULL,
+    variant TEXT NOT NULL DEFAULT '',
+    ts      REAL NOT NULL,
+    n_rows  INTEGER NOT NULL,
+    th      REAL,
+    sharpe  REAL,
+    p_value REAL,
+    dsr     REAL,
+    equity_path TEXT,
+    PRIMARY KEY (batch, asset, tf, variant)
+);
+CREATE INDEX IF NOT EXISTS batches_lookup ON batches (kind, model, asset, tf, variant, ts);
+"""
+
+_BATCH_COLS = ["batch", "kind", "asset", "tf", "model", "variant", "ts", "n_rows",
+               "th", "sharpe", "p_value", "dsr", "equity_path"]
+
+_UPSERT = f"""
+INSERT INTO batches ({', '.join(_BATCH_COLS)}) VALUES ({', '.join('?' * len(_BATCH_COLS))})
+ON CONFLICT (batch, asset, tf, variant) DO UPDATE SET
+    ts = max(ts, excluded.ts),
+    n_rows = n_rows + excluded.n_rows,
+    th = CASE WHEN excluded.sharpe > coalesce(sharpe, -1e300) THEN excluded.th ELSE th END,
+    p_value = CASE WHEN excluded.sharpe > coalesce(sharpe, -1e300) THEN excluded.p_value ELSE p_value END,
+    dsr = CASE WHEN excluded.sharpe > coalesce(sharpe, -1e300) THEN excluded.dsr ELSE dsr END,
+    equity_path = CASE WHEN excluded.sharpe > coalesce(sharpe, -1e300)
+                       THEN excluded.equity_path ELSE equity_path END,
+    sharpe = max(coalesce(sharpe, -1e300), coalesce(excluded.sharpe, -1e300))
+"""
+
+def connect(path: pathlib.Path = DB_PATH) -> sqlite3.Connection:
+    """WAL: párhuzamos olvasók egy író mellett; busy_timeout: a versengő írók várnak, nem hibáznak."""
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(path, timeout=30.0)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute("PRAGMA busy_timeout=30000")
+    con.executescript(_SCHEMA)
+    return con
+
+def new_batch() -> str:
+    return uuid.uuid4().hex
+
+def save_equity(curve: pd.Series, asset: str, tf: str, model: str, batch: str) -> pathlib.Path:
+    """Equity görbe -> reports/equity/{asset}_{tf}_{model}_{batch}.parquet"""
+    EQUITY_DIR.mkdir(parents=True, exist_ok=True)
+    p = EQUITY_DIR / f"{asset}_{tf}_{model}_{batch}.parquet"
+    curve.rename("equity").rename_axis("time").reset_index().to_parquet(p, index=False)
+    return p
+
+def load_equity(path: str) -> pd.Series:
+    df = pd.read_parquet(path)
+    return df.set_index("time")["equity"]
+
+def _row(r: Dict[str, Any], ts: float) -> tuple:
+    r = {**r}
+    r.setdefault("ts", ts)
+    params = r.get("params") or {}
+    params = json.loads(params) if isinstance(params, str) else dict(params)
+    params.update({k: v for k, v in r.items() if k not in COLUMNS and v is not None})
+    r["params"] = json.dumps(params, default=str) if params else None
+    if r.get("equity_path") is not None:
+        r["equity_path"] = str(r["equity_path"])
+    return tuple(r.get(c) for c in COLUMNS)
+
+def _batch_rows(data: List[tuple]) -> List[tuple]:
+    """Futásonként (batch, asset, tf, variant) a legjobb Sharpe-ú sor összesítője."""
+    best: Dict[tuple, Dict[str, Any]] = {}
+    for t in data:
+        r = dict(zip(COLUMNS, t))
+        k = (r["batch"], r["asset"], r["tf"], r["variant"] or "")
+        cur = best.get(k)
+        if cur is None:
+            best[k] = {**r, "variant": k[3], "n_rows": 1}
+            continue
+        cur["n_rows"] += 1
+        cur["ts"] = max(cur["ts"], r["ts"])
+        if r["sharpe"] is not None and (cur["sharpe"] is None or r["sharpe"] > cur["sharpe"]):
+            cur.update({c: r[c] for c in ("th", "sharpe", "p_value", "dsr", "equity_path")})
+    return [tuple(b[c] for c in _BATCH_COLS) for b in best.values()]
+
+def record_runs(rows: Iterable[Dict[str, Any]], path: pathlib.Path = DB_PATH) -> int:
+    """Bulk insert egy tranzakcióban (executemany). Ismeretlen kulcsok a params JSON-ba kerülnek."""
+    now = time.time()
+    data = [_row(r, now) for r in rows]
+    if not data:
+        return 0
+    con = connect(path)
+    try:
+        with con:
+            con.executemany(f"INSERT INTO runs ({', '.join(COLUMNS)}) "
+                            f"VALUES ({', '.join('?' * len(COLUMNS))})", data)
+            con.executemany(_UPSERT, _batch_rows(data))
+    finally:
+        con.close()
+    return len(data)
+
+def restore_runs(rows: Iterable[Dict[str, Any]], path: pathlib.Path = DB_PATH) -> int:
+    """
+    Korábban rögzített sorok (pl. a stage-cache által visszaállított futás-JSON-ból)
+    visszaírása; a DB-ben már meglévő batch-ek sorait kihagyja -> ismételhető.
+    """
+    rows = list(rows)
+    batches = sorted({r["batch"] for r in rows})
+    if not batches:
+        return 0
+    con = connect(path)
+    try:
+        have = {b for (b,) in con.execute(
+            f"SELECT DISTINCT batch FROM runs WHERE batch IN ({', '.join('?' * len(batches))})", batches)}
+    finally:
+        con.close()
+    return record_runs([r for r in rows if r["batch"] not in have], path=path)
+
+def write_runs_json(rows: List[Dict[str, Any]], result: Dict[str, Any], path: pathlib.Path) -> None:
+    """A rögzített sorok + a futás eredménye JSON-ba (a pipeline stage kimenete)."""
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"result": result, "rows": rows}, default=str), encoding="utf-8")
+
+def read_runs_json(path: pathlib.Path) -> Dict[str, Any]:
+    return json.loads(pathlib.Path(path).read_text(encoding="utf-8"))
+
+_BEST_SQL = """
+WITH rb AS (
+    SELECT asset, tf, variant, th, sharpe, p_value, dsr, ts, equity_path,
+           ROW_NUMBER() OVER (PARTITION BY asset, tf, variant ORDER BY ts DESC) AS rn
+    FROM batches WHERE kind = :kind AND model = :model {where}
+), r AS (
+    SELECT *, ROW_NUMBER() OVER (PARTITION BY asset, tf, variant
+                                 ORDER BY sharpe DESC, ts DESC) AS k
+    FROM rb WHERE rn <= :last_n AND sharpe IS NOT NULL
+)
+SELECT asset, tf, variant, th, sharpe, p_value, dsr, ts, equity_path FROM r WHERE k = 1 ORDER BY asset, tf
+"""
+
+def best_thresholds(model: str, last_n: int = 30, kind: str = "tune", asset: Optional[str] = None,
+                    tf: Optional[str] = None, variant: Optional[str] = None,
+                    path: pathlib.Path = DB_PATH) -> pd.DataFrame:
+    """Asset×tf×variánsonként a legjobb Sharpe-ú küszöb az utolsó `last_n` futásból (batch)."""
+    where, params = "", {"kind": kind, "model": model, "last_n": int(last_n)}
+    for col, val in (("asset", asset), ("tf", tf), ("variant", variant)):
+        if val is not None:
+            where += f" AND {col} = :{col}"
+            params[col] = val if col != "variant" else val or ""
+    con = connect(path)
+    try:
+        return pd.read_sql_query(_BEST_SQL.format(where=where), con, params=params)
+    finally:
+        con.close()
+
+def best_threshold(asset: str, tf: str, model: str, variant: str, last_n: int = 30,
+                   path: pathlib.Path = DB_PATH) -> Optional[float]:
+    if not pathlib.Path(path).exists():
+        return None
+    df = best_thresholds(model, last_n, asset=asset, tf=tf, variant=variant, path=path)
+    return None if df.empty or pd.isna(df["th"].iloc[0]) else float(df["th"].iloc[0])
+
+def query_runs(kind: Optional[str] = None, limit: int = 100, path: pathlib.Path = DB_PATH,
+               **eq: Any) -> pd.DataFrame:
+    """Legutóbbi futások egyenlőségi szűrőkkel (pl. asset="BTCUSDT", tf="4h")."""
+    conds, params = [], []
+    if kind is not None:
+        eq["kind"] = kind
+    for col, val in eq.items():
+        if col not in COLUMNS:
+            raise ValueError(f"Unknown column: {col}")
+        conds.append(f"{col} = ?")
+        params.append(val)
+    sql = "SELECT * FROM runs" + (" WHERE " + " AND ".join(conds) if conds else "")
+    sql += " ORDER BY ts DESC LIMIT ?"
+    con = connect(path)
+    try:
+        return pd.read_sql_query(sql, con, params=[*params, int(limit)])
+    finally:
+        con.close()
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default="logreg")
+    ap.add_argument("--variant", default=None)
+    ap.add_argument("--tf", default=None)
+    ap.add_argument("--last", type=int, default=30, help="az utolsó N futás (batch) assetenként")
+    ap.add_argument("--kind", default="tune", choices=["tune", "backtest"])
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    df = best_thresholds(args.model, args.last, args.kind, tf=args.tf, variant=args.variant)
+    print(df.to_string(index=False))
+    logger.info(f"{len(df)} rows in {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# src/backtest/significance.py
+# Szignifikancia a backtest hozamsorára: blokk-bootstrap (CI) és előjel-randomizálás
+# (p-érték), egyben NumPy-mátrixként (chunk × n) számolva, opcionálisan
+# process poolban; plusz deflated Sharpe a tuner által kipróbált küszöbök számára.
+from __future__ import annotations
+import math
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+# egy chunk legfeljebb ennyi float64 elem (~32 MB)
+CHUNK_ELEMS = 4_000_000
+EULER_GAMMA = 0.5772156649015329
+_N = NormalDist()
+
+def sharpe(r: np.ndarray, ppy: float = 1.0) -> np.ndarray:
+    """Sharpe az utolsó tengely mentén (ppy=1 -> bar-onkénti, nem évesített)."""
+    r = np.asarray(r, dtype=np.float64)
+    mu = r.mean(axis=-1)
+    sd = r.std(axis=-1, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(sd > 0, mu / sd, 0.0)
+    return out * math.sqrt(ppy)
+
+def _chunks(n_boot: int, n: int, chunk: Optional[int]) -> List[int]:
+    size = chunk or max(1, CHUNK_ELEMS // max(n, 1))
+    return [min(size, n_boot - i) for i in range(0, n_boot, size)]
+
+def _block_chunk(ret: np.ndarray, size: int, block: int, seed: np.random.SeedSequence) -> np.ndarray:
+    # körkörös mozgó blokk: ceil(n/block) véletlen kezdőpont, blokkonként egymás utáni indexek
+    rng = np.random.default_rng(seed)
+    n = len(ret)
+    k = -(-n // block)
+    starts = rng.integers(0, n, size=(size, k, 1))
+    idx = ((starts + np.arange(block)) % n).reshape(size, k * block)[:, :n]
+    return sharpe(ret[idx])
+
+def _sign_chunk(ret: np.ndarray, size: int, block: int, seed: np.random.SeedSequence) -> np.ndarray:
+    # H0: nincs időzítési él -> a bar-hozamok előjele véletlen
+    rng = np.random.default_rng(seed)
+    signs = rng.integers(0, 2, size=(size, len(ret)), dtype=np.int8) * 2 - 1
+    return sharpe(signs * ret)
+
+_KINDS = {"block": _block_chunk, "sign": _sign_chunk}
+
+def resample_sharpes(ret: np.ndarray, n_boot: int = 2000, kind: str = "block",
+                     block: Optional[int] = None, seed: Optional[int] = None,
+                     workers: int = 1, chunk: Optional[int] = None) -> np.ndarray:
+    """
+    n_boot újramintavételezett (bar-onkénti) Sharpe. kind: "block" | "sign".
+    Chunkonként külön SeedSequence-gyerek -> az eredmény független a workers számától.
+    """
+    ret = np.asarray(ret, dtype=np.float64)
+    ret = ret[np.isfinite(ret)]
+    if len(ret) < 2 or n_boot <= 0:
+        return np.zeros(0)
+    block = int(block or max(1, round(len(ret) ** (1 / 3))))
+    sizes = _chunks(n_boot, len(ret), chunk)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    fn = _KINDS[kind]
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            parts = list(ex.map(fn, [ret] * len(sizes), sizes, [block] * len(sizes), seeds))
+    else:
+        parts = [fn(ret, s, block, sd) for s, sd in zip(sizes, seeds)]
+    return np.concatenate(parts)
+
+def expected_max_sharpe(trial_var: float, n_trials: int) -> float:
+    """N független próba maximumának várható Sharpe-ja H0 alatt (bar-onkénti egység)."""
+    if n_trials < 2 or trial_var <= 0:
+        return 0.0
+    z1 = _N.inv_cdf(1.0 - 1.0 / n_trials)
+    z2 = _N.inv_cdf(1.0 - 1.0 / (n_trials * math.e))
+    return math.sqrt(trial_var) * ((1.0 - EULER_GAMMA) * z1 + EULER_GAMMA * z2)
+
+def deflated_sharpe(ret: np.ndarray, trial_sharpes: Sequence[float], ppy: float = 1.0) -> Dict[str, float]:
+    """
+    Deflated Sharpe (Bailey–López de Prado): P(valódi SR > SR0), ahol SR0 a
+    kipróbált küszöbök Sharpe-szórásából várható maximum; ferdeség/csúcsosság korrigálva.
+    trial_sharpes évesített (ppy) egységben, ahogy a tuner adja.
+    """
+    r = np.asarray(ret, dtype=np.float64)
+    r = r[np.isfinite(r)]
+    t = len(r)
+    sd = r.std(ddof=1) if t > 1 else 0.0
+    if t < 3 or sd <= 0:
+        return {"dsr": 0.0, "sr0": 0.0, "n_trials": len(trial_sharpes)}
+    sr = r.mean() / sd
+    z = (r - r.mean()) / r.std()
+    skew, kurt = float((z ** 3).mean()), float((z ** 4).mean())
+    trials = np.asarray(trial_sharpes, dtype=np.float64) / math.sqrt(ppy)
+    trials = trials[np.isfinite(trials)]
+    sr0 = expected_max_sharpe(float(trials.var(ddof=1)) if len(trials) > 1 else 0.0, len(trials))
+    denom = 1.0 - skew * sr + (kurt - 1.0) / 4.0 * sr ** 2
+    dsr = _N.cdf((sr - sr0) * math.sqrt(t - 1) / math.sqrt(denom)) if denom > 0 else 0.0
+    return {"dsr": dsr, "sr0": sr0 * math.sqrt(ppy), "n_trials": len(trials)}
+
+def significance(ret: np.ndarray, ppy: float = 1.0, trial_sharpes: Optional[Sequence[float]] = None,
+                 n_boot: int = 2000, block: Optional[int] = None, alpha: float = 0.05,
+                 seed: Optional[int] = 0, workers: int = 1) -> Dict[str, float]:
+    """
+    Összefoglaló (évesített Sharpe egységben):
+      sharpe, ci_lo/ci_hi (blokk-bootstrap percentilis), p_value (előjel-randomizálás,
+      egyoldali H0: SR <= 0), dsr/sr0/n_trials (deflated Sharpe, ha van trial_sharpes).
+    """
+    r = np.asarray(ret, dtype=np.float64)
+    r = r[np.isfinite(r)]
+    obs = float(sharpe(r)) if len(r) > 1 else 0.0
+    boot = resample_sharpes(r, n_boot, "block", block, seed, workers)
+    null = resample_sharpes(r, n_boot, "sign", block, None if seed is None else seed + 1, workers)
+    scale = math.sqrt(ppy)
+    out = {
+        "sharpe": obs * scale,
+        "ci_lo": float(np.quantile(boot, alpha / 2)) * scale if len(boot) else 0.0,
+        "ci_hi": float(np.quantile(boot, 1 - alpha / 2)) * scale if len(boot) else 0.0,
+        "p_value": float((1 + (null >= obs).sum()) / (1 + len(null))) if len(null) else 1.0,
+    }
+    if trial_sharpes is not None:
+        out.update(deflated_sharpe(r, trial_sharpes, ppy))
+    return {k: (v if isinstance(v, int) else round(float(v), 6)) for k, v in out.items()}
@@ -3,11 +3,19 @@
 # Jel-formátum: {-1, 0, +1} vagy folytonos [-1..+1], ahol "hold" float esetén küszöb.
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass
 from typing import Dict, Any, Optional
 
 import numpy as np
 import pandas as pd
+from loguru import logger
+
+from src.backtest import results_db
+from src.features.variants import load_features
+from src.models.registry import cutoff as model_cutoff
+from src.signals.generate import generate_signals
+from src.signals.store import read_signals
 
 
 @dataclass
@@ -165,3 +173,119 @@ def run_backtest(
     )
     return out.to_dict()
 
+
+def periods_per_year(asset: str, tf: str) -> float:
+    """Évesítéshez: bar/év. A kripto 24/7, a többi 1d sor kereskedési napos."""
+    if tf.endswith("h"):
+        return 24.0 / float(tf[:-1]) * 365.0
+    return 365.0 if asset.upper().endswith("USDT") else 252.0
+
+
+def summarize(res: Dict[str, Any], ppy: float) -> Dict[str, float]:
+    """Sharpe (évesített), teljes hozam, max drawdown, kötések száma."""
+    ret = res["ret_series"].astype(float)
+    eq = res["equity_curve"].astype(float)
+    sd = float(ret.std())
+    sharpe = float(ret.mean()) / sd * float(np.sqrt(ppy)) if sd > 0 else 0.0
+    dd = float((eq / eq.cummax() - 1.0).min()) if len(eq) else 0.0
+    return {
+        "sharpe": round(sharpe, 6),
+        "total_ret": round(float(eq.iloc[-1] / eq.iloc[0] - 1.0) if len(eq) else 0.0, 6),
+        "max_dd": round(dd, 6),
+        "trades": int(res["trades"]),
+    }
+
+
+def backtest_asset(
+    asset: str,
+    tf: str,
+    model: str = "logreg",
+    th: float = 0.6,
+    hold: float = 0.4,
+    fee_bps: float = 1.0,
+    variant: str = "base_news",
+    shared: bool = False,
+) -> Dict[str, Any]:
+    """
+    Jelek (model registry, memoizált valószínűségek) + close ár -> run_backtest.
+    Ugyanabban a folyamatban ismételve (tuning) nincs újratöltés.
+    Csak a modell holdout-határa (cutoff) utáni barokon értékel: out-of-sample.
+    """
+    sig = generate_signals(asset, tf, model, th, hold, variant, shared)
+    start = model_cutoff(asset, tf, model, variant, shared)
+    if start is None:
+        logger.warning(f"[{asset} {tf}] model artifact has no holdout cutoff: in-sample evaluation")
+    else:
+        sig = sig[sig["time"] >= start]
+    return _backtest_with_prices(sig, asset, tf, hold, fee_bps, start=start)
+
+
+def backtest_stored(
+    asset: str,
+    tf: str,
+    model: str = "logreg",
+    hold: float = 0.4,
+    fee_bps: float = 1.0,
+    start=None,
+    end=None,
+) -> Dict[str, Any]:
+    """Backtest a jel-tárban már meglévő jelekre (opcionális [start, end) ablak)."""
+    sig = read_signals(asset, tf, model, start=start, end=end)
+    return _backtest_with_prices(sig, asset, tf, hold, fee_bps, start=start, end=end)
+
+
+def _backtest_with_prices(sig: pd.DataFrame, asset: str, tf: str, hold, fee_bps: float,
+                          start=None, end=None) -> Dict[str, Any]:
+    px = load_features(asset, tf, columns=["time", "close"], start=start, end=end)
+    df = px.merge(sig[["time", "signal"]], on="time", how="inner").set_index("time")
+    res = run_backtest(df, fee_bps=fee_bps, hold=hold)
+    return {**res, "summary": summarize(res, periods_per_year(asset, tf))}
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--asset", required=True)
+    ap.add_argument("--tf", required=True)
+    ap.add_argument("--model", default="logreg")
+    ap.add_argument("--variant", default="base_news")
+    ap.add_argument("--th", type=float, default=0.6)
+    ap.add_argument("--hold", type=float, default=0.4)
+    ap.add_argument("--fee_bps", type=float, default=1.0)
+    ap.add_argument("--shared", action="store_true",
+                    help="a közös ALL_{tf} modell (config: train_shared)")
+    ap.add_argument("--from_store", action="store_true",
+                    help="a jel-tárban lévő jeleket teszteljük (nincs újragenerálás, --th nem számít)")
+    ap.add_argument("--start", default=None)
+    ap.add_argument("--end", default=None)
+    ap.add_argument("--no_record", action="store_true", help="ne írjuk a results DB-be")
+    ap.add_argument("--out", default=None,
+                    help="futás-JSON (rögzített sor + összegzés), pl. a pipeline stage kimenete")
+    args = ap.parse_args()
+
+    if args.from_store:
+        out = backtest_stored(args.asset, args.tf, args.model, args.hold, args.fee_bps,
+                              start=args.start, end=args.end)
+    else:
+        out = backtest_asset(args.asset, args.tf, args.model, args.th, args.hold,
+                             args.fee_bps, args.variant, args.shared)
+    rows = []
+    if not args.no_record:
+        batch = results_db.new_batch()
+        eq = results_db.save_equity(out["equity_curve"], args.asset, args.tf, args.model, batch)
+        rows = [{
+            "batch": batch, "ts": time.time(), "kind": "backtest", "asset": args.asset, "tf": args.tf,
+            "model": args.model, "variant": None if args.from_store else args.variant,
+            "th": None if args.from_store else args.th, "hold": args.hold, "fee_bps": args.fee_bps,
+            "equity_path": eq, "start": args.start, "end": args.end, **out["summary"],
+        }]
+        results_db.record_runs(rows)
+    summary = {"asset": args.asset, "tf": args.tf, "th": args.th, **out["summary"]}
+    if args.out:
+        results_db.write_runs_json(rows, summary, args.out)
+    # utolsó sor: dict (a pipeline/tuner ezt olvassa vissza)
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
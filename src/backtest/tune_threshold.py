@@ -1,30 +1,9 @@
-from pathlib import Path
+import time
 import numpy as np
-import subprocess as sp
-import sys, json
 
-PY = sys.executable
-ROOT = Path(__file__).resolve().parents[0]
-
-def run_bt(asset, tf, model, th, hold, fee):
-    p = sp.Popen(
-        [PY, "simple_bt.py",
-         "--asset", asset, "--tf", tf, "--model", model,
-         "--th", str(th), "--hold", str(hold), "--fee_bps", str(fee)],
-        cwd=str(ROOT), stdout=sp.PIPE, stderr=sp.STDOUT, text=True
-    )
-    out, _ = p.communicate()
-    # simple_bt a végén kiír egy dictet (pl. {"sharpe": ...})
-    val = 0.0
-    for ln in out.splitlines()[::-1]:
-        if "sharpe" in ln and "{" in ln:
-            try:
-                obj = json.loads(ln.replace("'", "\""))
-                val = float(obj.get("sharpe", val))
-                break
-            except Exception:
-                continue
-    return val
+from src.backtest.simple_bt import backtest_asset, periods_per_year
+from src.backtest.significance import significance
+from src.backtest import results_db
 
 def main():
     import argparse
@@ -32,20 +11,52 @@ def main():
     ap.add_argument("--asset", required=True)
     ap.add_argument("--tf", required=True)
     ap.add_argument("--model", default="corrnet")
+    ap.add_argument("--variant", default="base_news")
     ap.add_argument("--hold", type=float, default=0.4)
     ap.add_argument("--fee_bps", type=float, default=1.0)
+    ap.add_argument("--shared", action="store_true",
+                    help="a közös ALL_{tf} modell (config: train_shared)")
     ap.add_argument("--th_from", type=float, default=0.55)
     ap.add_argument("--th_to", type=float, default=0.7)
     ap.add_argument("--th_step", type=float, default=0.02)
+    ap.add_argument("--n_boot", type=int, default=1000,
+                    help="bootstrap/randomizációs minták a legjobb küszöbre (0 = kihagyás)")
+    ap.add_argument("--sig_workers", type=int, default=1)
+    ap.add_argument("--no_record", action="store_true", help="ne írjuk a results DB-be")
+    ap.add_argument("--out", default=None,
+                    help="futás-JSON (rögzített sorok + eredmény), pl. a pipeline stage kimenete")
     args = ap.parse_args()
 
-    best = (-1e9, None)
+    # minden küszöb Sharpe-ja kell a deflated Sharpe-hoz (hány próbából választottunk)
+    best, best_res, trials, rows = (-1e9, None), None, [], []
+    batch, ts = results_db.new_batch(), time.time()
     ths = np.arange(args.th_from, args.th_to + 1e-9, args.th_step)
     for th in ths:
-        s = run_bt(args.asset, args.tf, args.model, th, args.hold, args.fee_bps)
+        res = backtest_asset(args.asset, args.tf, args.model, th, args.hold, args.fee_bps, args.variant,
+                             args.shared)
+        s = res["summary"]["sharpe"]
+        trials.append(s)
+        rows.append({"batch": batch, "ts": ts, "kind": "tune", "asset": args.asset, "tf": args.tf,
+                     "model": args.model, "variant": args.variant, "th": round(float(th), 6),
+                     "hold": args.hold, "fee_bps": args.fee_bps, **res["summary"]})
         if s > best[0]:
-            best = (s, th)
-    print({"best_sharpe": best[0], "best_th": best[1]})
+            best, best_res = (s, th), (len(rows) - 1, res)
+    out = {"best_sharpe": best[0], "best_th": None if best[1] is None else round(float(best[1]), 6)}
+    if args.n_boot > 0 and best_res is not None:
+        sig = significance(best_res[1]["ret_series"].to_numpy(), periods_per_year(args.asset, args.tf),
+                           trials, n_boot=args.n_boot, workers=args.sig_workers)
+        out.update({k: v for k, v in sig.items() if k != "sharpe"})
+    recorded = []
+    if not args.no_record and best_res is not None:
+        i, res = best_res
+        rows[i].update({k: out[k] for k in ("p_value", "dsr") if k in out})
+        rows[i]["equity_path"] = results_db.save_equity(res["equity_curve"], args.asset, args.tf,
+                                                        args.model, batch)
+        results_db.record_runs(rows)
+        recorded = rows
+    if args.out:
+        results_db.write_runs_json(recorded, out, args.out)
+    print(out)
 
 if __name__ == "__main__":
     main()
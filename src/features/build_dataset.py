@@ -1,71 +1,336 @@
 # src/features/build_dataset.py
 from __future__ import annotations
 import pathlib
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional
+import numpy as np
 import pandas as pd
-import yaml
+import pyarrow as pa
+import pyarrow.parquet as pq
 from loguru import logger
 
+from src.features.raw_io import RAW_DIR, _guess_timeframes, _load_raw, load_config
 from src.features.ta_features import compute_indicators
+from src.features.labels import LabelSpec, add_labels
+from src.features.corr_engine import aligned_returns, merge_corr, rolling_corr_features
+from src.features.variants import FEATURE_ROW_GROUP, is_label_column
 
-RAW_DIR = pathlib.Path("data/raw")
 OUT_DIR = pathlib.Path("data/features")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-def load_config(path: str | pathlib.Path = "config.yaml") -> Dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+MIN_ROWS = 60
+# Streaming módban ennyi korábbi sort viszünk át a következő chunk elé.
+# SMA50/MACD-hez ~60 sor elég, a rekurzív (EMA/RMA) indikátorok eltérése
+# (1-alpha)^N szerint csillapodik -> 1000 sornál float pontosságon belül egyezik.
+WARMUP_ROWS = 1000
+STREAM_CHUNK_ROWS = 250_000
 
-def _guess_timeframes(asset: str, cfg_tfs: List[str]) -> List[str]:
-    # kriptóknál 4h+1d, a többinél 1d (M1 szabály)
-    return cfg_tfs if asset.upper().endswith("USDT") else ["1d"]
-
-def _load_raw(asset: str, tf: str) -> pd.DataFrame:
+def read_raw_since(asset: str, tf: str, since: pd.Timestamp) -> pd.DataFrame:
+    """A raw fájl `since` utáni (>=) sorai; az időszűrő a parquet olvasóba kerül."""
     p = RAW_DIR / f"{asset}_{tf}.parquet"
     if not p.exists():
-        logger.warning(f"Missing raw file: {p}")
-        return pd.DataFrame(columns=["time","open","high","low","close","volume"])
-    df = pd.read_parquet(p)
-    # biztos UTC datetime
+        return pd.DataFrame()
+    try:
+        df = pd.read_parquet(p, filters=[("time", ">=", since)])
+    except (pa.ArrowException, TypeError, ValueError):
+        # nem időbélyeg típusú time oszlop -> teljes olvasás, szűrés pandasban
+        df = pd.read_parquet(p)
     df["time"] = pd.to_datetime(df["time"], utc=True, errors="coerce")
-    return df
+    return df[df["time"] >= since].reset_index(drop=True)
 
-def _make_target(df: pd.DataFrame, horizon: int = 1) -> pd.DataFrame:
+def _make_target(df: pd.DataFrame, horizon: int = 1, copy: bool = True) -> pd.DataFrame:
     # Következő periódus hozam + előjel (klasszifikáció)
-    df = df.copy()
+    if copy:
+        df = df.copy()
+    # a legutolsó sor(ok) jövője még nem ismert: target_ret NaN, target_sign NA (nem 0)
     df["target_ret"] = df["close"].pct_change(horizon).shift(-horizon)
-    df["target_sign"] = (df["target_ret"] > 0).astype("int8")
+    df["target_sign"] = (df["target_ret"] > 0).astype("Int8").mask(df["target_ret"].isna())
     return df
 
-def build_features_for(asset: str, tf: str) -> pd.DataFrame:
+def _finalize(df: pd.DataFrame, labels: Optional[LabelSpec]) -> pd.DataFrame:
+    # tisztítás: az indikátorok eleje NaN → dobjuk
+    # (a target/címkék végén lévő NaN-ok nem számítanak: azok a jövő hiányát jelzik,
+    # a legfrissebb bar sora kell az inferenciához; séma: variants.TARGET_COLS fölött,
+    # a tanítás load_features(labeled=True)-val olvas)
+    subset = [c for c in df.columns if not is_label_column(c)]
+    return df.dropna(subset=subset).reset_index(drop=True)
+
+def build_features_for(asset: str, tf: str, labels: Optional[LabelSpec] = None) -> pd.DataFrame:
     df = _load_raw(asset, tf)
-    if df.empty or len(df) < 60:
+    if df.empty or len(df) < MIN_ROWS:
         return pd.DataFrame()
     df = compute_indicators(df)
-    df = _make_target(df, horizon=1)
-    # tisztítás: az indikátorok eleje NaN → dobjuk
-    df = df.dropna().reset_index(drop=True)
+    # compute_indicators már másolatot ad -> nem kell még egy
+    df = _make_target(df, horizon=1, copy=False)
+    if labels is not None:
+        df = add_labels(df, labels)
+    df = _finalize(df, labels)
     # rendeljük az asset+tf meta infót
     df.insert(0, "asset", asset)
     df.insert(1, "timeframe", tf)
     return df
 
-def build_all_features(cfg_path: str | pathlib.Path = "config.yaml") -> None:
+def _iter_raw_chunks(p: pathlib.Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    pf = pq.ParquetFile(p)
+    for batch in pf.iter_batches(batch_size=chunk_rows):
+        df = batch.to_pandas()
+        df["time"] = pd.to_datetime(df["time"], utc=True, errors="coerce")
+        yield df
+
+def iter_features_for(
+    asset: str,
+    tf: str,
+    chunk_rows: int = STREAM_CHUNK_ROWS,
+    warmup_rows: int = WARMUP_ROWS,
+    horizon: int = 1,
+    labels: Optional[LabelSpec] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Streaming feature-építés: a raw parquet-et row group/batch szinten,
+    időrendben olvassuk, és minden chunk elé odatesszük az előző chunk
+    utolsó `warmup_rows` nyers sorát (indikátor bemelegítés).
+
+    A chunk végén `horizon` (címkéknél a legnagyobb előretekintés) sort
+    visszatartunk, mert a targetjükhöz a következő chunk első sorai kellenek. Az OBV kumulatív, ezért az átfedő
+    soron mért eltéréssel eltoljuk, így a kimenet a memóriabeli
+    `build_features_for` eredményével egyezik.
+    """
+    p = RAW_DIR / f"{asset}_{tf}.parquet"
+    if not p.exists():
+        logger.warning(f"Missing raw file: {p}")
+        return
+    if pq.ParquetFile(p).metadata.num_rows < MIN_ROWS:
+        return
+
+    lookahead = max(1, int(horizon), labels.lookahead if labels is not None else 0)
+    tail = pd.DataFrame()
+    pending = 0          # a tail végén lévő, még ki nem írt sorok száma
+    obv_last = None      # az előző ablak utolsó sorának OBV értéke
+    last_time = None
+
+    def _emit(feat: pd.DataFrame, start: int, stop: int) -> pd.DataFrame:
+        out = _finalize(feat.iloc[start:stop], labels)
+        out.insert(0, "asset", asset)
+        out.insert(1, "timeframe", tf)
+        return out
+
+    feat = None
+    for raw in _iter_raw_chunks(p, chunk_rows):
+        if raw.empty:
+            continue
+        t0 = raw["time"].min()
+        if last_time is not None and t0 < last_time:
+            raise ValueError(f"Raw file not in time order: {p}")
+        last_time = raw["time"].max()
+
+        window = pd.concat([tail, raw], ignore_index=True) if len(tail) else raw
+        feat = compute_indicators(window)
+        feat = _make_target(feat, horizon=horizon, copy=False)
+        if labels is not None:
+            feat = add_labels(feat, labels)
+
+        n_tail = len(tail)
+        if obv_last is not None:
+            feat["obv"] = feat["obv"] + (obv_last - feat["obv"].iat[n_tail - 1])
+
+        start = n_tail - pending
+        stop = max(start, len(feat) - lookahead)
+        if stop > start:
+            yield _emit(feat, start, stop)
+
+        keep = max(warmup_rows, lookahead)
+        tail = window.iloc[-keep:].reset_index(drop=True)
+        pending = len(feat) - stop
+        obv_last = float(feat["obv"].iat[-1])
+
+    # fájl vége: a visszatartott sorok is mennek (target/címke NaN-nal, mint a memóriabeli út)
+    if feat is not None and pending > 0:
+        out = _emit(feat, len(feat) - pending, len(feat))
+        if not out.empty:
+            yield out
+
+class LiveFeatures:
+    """
+    Élő (bar-zárásonkénti) feature-frissítés egy asset×tf-re meleg állapottal: az
+    utolsó `warmup_rows` nyers sor és a hozzájuk tartozó (teljes történetre vett) OBV.
+    Új barokra az indikátorok csak a (tail + új sorok) ablakon futnak, mint a
+    streaming buildben. A step() a még nyitott jövőjű (target/címke) sorokat is
+    újra kiadja, hogy a hívó a feature-fájlban felülírja őket.
+    """
+
+    def __init__(self, asset: str, tf: str, labels: Optional[LabelSpec] = None,
+                 warmup_rows: int = WARMUP_ROWS, horizon: int = 1):
+        self.asset, self.tf, self.labels, self.horizon = asset, tf, labels, int(horizon)
+        self.lookahead = max(1, self.horizon, labels.lookahead if labels is not None else 0)
+        self.keep = max(int(warmup_rows), self.lookahead)
+        self.tail = pd.DataFrame()
+        self.obv = np.empty(0)
+
+    @property
+    def last_time(self) -> Optional[pd.Timestamp]:
+        return None if self.tail.empty else self.tail["time"].iat[-1]
+
+    def _features(self, window: pd.DataFrame) -> pd.DataFrame:
+        feat = compute_indicators(window)
+        feat = _make_target(feat, horizon=self.horizon, copy=False)
+        if self.labels is not None:
+            feat = add_labels(feat, self.labels)
+        return feat
+
+    def _remember(self, feat: pd.DataFrame, raw_cols: List[str]) -> None:
+        ok = feat["time"].notna().to_numpy()
+        self.tail = feat.loc[ok, raw_cols].iloc[-self.keep:].reset_index(drop=True)
+        self.obv = feat["obv"].to_numpy(dtype=np.float64)[ok][-self.keep:]
+
+    def _emit(self, feat: pd.DataFrame, start: int) -> pd.DataFrame:
+        out = _finalize(feat.iloc[start:], self.labels)
+        out.insert(0, "asset", self.asset)
+        out.insert(1, "timeframe", self.tf)
+        return out
+
+    def prime(self) -> pd.DataFrame:
+        """Hidegindítás: teljes build a raw fájlból (= build_features_for) + állapot felvétele."""
+        raw = _load_raw(self.asset, self.tf)
+        if raw.empty or len(raw) < MIN_ROWS:
+            return pd.DataFrame()
+        feat = self._features(raw)
+        self._remember(feat, list(raw.columns))
+        return self._emit(feat, 0)
+
+    def step(self, new: Optional[pd.DataFrame], since: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        new: a raw fájl last_time-tól (>=) olvasott sorai; az utolsó ismert bar revíziója
+        felülírja a tailt. Kiadja az új sorokat, a még nyitott jövőjű utolsó `lookahead`
+        sort és (ha meg van adva) a `since` utáni sorokat.
+        """
+        if self.tail.empty:
+            return self.prime()
+        tail, obv = self.tail, self.obv
+        if new is not None:
+            new = new.dropna(subset=["time"]).sort_values("time")
+        if new is not None and not new.empty:
+            keep = (tail["time"] < new["time"].iat[0]).to_numpy()
+            tail, obv = tail[keep], obv[keep]
+            if tail.empty:
+                return self.prime()
+            window = pd.concat([tail, new[tail.columns]], ignore_index=True)
+        elif since is not None:
+            window = tail
+        else:
+            return pd.DataFrame()
+        n_tail = len(tail)
+        feat = self._features(window)
+        feat["obv"] = feat["obv"] + (obv[-1] - feat["obv"].iat[n_tail - 1])
+        start = n_tail - self.lookahead
+        if since is not None:
+            start = min(start, int(feat["time"].searchsorted(since, side="right")))
+        self._remember(feat, list(self.tail.columns))
+        return self._emit(feat, max(start, 0))
+
+def build_features_streaming(
+    asset: str,
+    tf: str,
+    out: pathlib.Path,
+    chunk_rows: int = STREAM_CHUNK_ROWS,
+    warmup_rows: int = WARMUP_ROWS,
+    labels: Optional[LabelSpec] = None,
+    corr: Optional[pd.DataFrame] = None,
+) -> int:
+    """`iter_features_for` chunkjait inkrementális ParquetWriterrel írja ki. Visszaad: sorok száma."""
+    writer = None
+    schema = None
+    n = 0
+    tmp = out.with_suffix(".parquet.tmp")
+    try:
+        for chunk in iter_features_for(asset, tf, chunk_rows=chunk_rows,
+                                       warmup_rows=warmup_rows, labels=labels):
+            if corr is not None:
+                chunk = merge_corr(chunk, corr, asset, tf)
+            if chunk.empty:
+                continue
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                schema = table.schema
+                writer = pq.ParquetWriter(tmp, schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            writer.write_table(table, row_group_size=FEATURE_ROW_GROUP)
+            n += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if n:
+        tmp.replace(out)
+    elif tmp.exists():
+        tmp.unlink()
+    return n
+
+def load_closes(assets: List[str], tf: str) -> Dict[str, pd.DataFrame]:
+    """asset -> raw time+close (csak ez a két oszlop olvasódik)."""
+    closes = {}
+    for a in assets:
+        p = RAW_DIR / f"{a}_{tf}.parquet"
+        if p.exists():
+            closes[a] = pd.read_parquet(p, columns=["time", "close"])
+    return closes
+
+def load_aligned_returns(assets: List[str], tf: str) -> pd.DataFrame:
+    """Igazított hozam-tábla a raw close-okból (csak time+close olvasás)."""
+    return aligned_returns(load_closes(assets, tf), tf)
+
+def build_corr_for(assets: List[str], tf: str, window: int) -> pd.DataFrame:
+    """Cross-asset gördülő korrelációs feature-ök egy timeframe-re."""
+    rets = load_aligned_returns(assets, tf)
+    if rets.empty:
+        logger.warning(f"Corr features: not enough assets with data for {tf}")
+        return pd.DataFrame()
+    corr = rolling_corr_features(rets, window=window)
+    out = OUT_DIR / f"corr_{tf}.parquet"
+    corr.to_parquet(out, index=False, row_group_size=FEATURE_ROW_GROUP)
+    logger.info(f"Saved corr features {tf}: {rets.shape[1]} assets, window={window} -> {out}")
+    return corr
+
+def build_all_features(
+    cfg_path: str | pathlib.Path = "config.yaml",
+    stream: bool = False,
+    chunk_rows: int = STREAM_CHUNK_ROWS,
+) -> None:
     cfg = load_config(cfg_path)
     assets: List[str] = cfg["assets"]
     cfg_tfs: List[str] = cfg.get("timeframes", ["4h","1d"])
+    labels = LabelSpec.from_cfg(cfg.get("labels"))
     logger.info(f"Building features for {len(assets)} assets…")
 
+    # cross-asset korreláció timeframe-enként egyszer (corrnet)
+    corr_by_tf: Dict[str, pd.DataFrame] = {}
+    corr_window = cfg.get("corr_window")
+    if corr_window:
+        for tf in cfg_tfs:
+            tf_assets = [a for a in assets if tf in _guess_timeframes(a, cfg_tfs)]
+            corr = build_corr_for(tf_assets, tf, int(corr_window))
+            if not corr.empty:
+                corr_by_tf[tf] = corr
+
     total_rows = 0
     for asset in assets:
         for tf in _guess_timeframes(asset, cfg_tfs):
             try:
-                feat = build_features_for(asset, tf)
+                out = OUT_DIR / f"{asset}_{tf}.parquet"
+                if stream:
+                    n = build_features_streaming(asset, tf, out, chunk_rows=chunk_rows,
+                                                 labels=labels, corr=corr_by_tf.get(tf))
+                    if not n:
+                        logger.warning(f"Skip features: empty {asset} {tf}")
+                        continue
+                    total_rows += n
+                    logger.info(f"Saved features (stream) {asset} {tf}: {n:,} rows -> {out}")
+                    continue
+                feat = build_features_for(asset, tf, labels=labels)
                 if feat.empty:
                     logger.warning(f"Skip features: empty {asset} {tf}")
                     continue
-                out = OUT_DIR / f"{asset}_{tf}.parquet"
-                feat.to_parquet(out, index=False)
+                if tf in corr_by_tf:
+                    feat = merge_corr(feat, corr_by_tf[tf], asset, tf)
+                feat.to_parquet(out, index=False, row_group_size=FEATURE_ROW_GROUP)
                 total_rows += len(feat)
                 logger.info(f"Saved features {asset} {tf}: {len(feat):,} rows -> {out}")
             except Exception as e:
@@ -74,7 +339,13 @@ def build_all_features(cfg_path: str | pathlib.Path = "config.yaml") -> None:
     logger.info(f"Features build done ✅ total_rows={total_rows:,}")
 
 def main():
-    build_all_features()
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stream", action="store_true",
+                    help="chunkolt (out-of-core) feature-építés hosszú intraday history-hoz")
+    ap.add_argument("--chunk_rows", type=int, default=STREAM_CHUNK_ROWS)
+    args = ap.parse_args()
+    build_all_features(stream=args.stream, chunk_rows=args.chunk_rows)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,264 @@
+# src/features/corr_engine.py
+# Gördülő cross-asset korreláció/kovariancia (a corrnet modellhez).
+# Inkrementális összeg + kereszt-szorzat frissítés: új barra O(k²), nem kell
+# az egész ablakot újraszámolni. Per-asset kivonatok: átlagos korreláció és
+# az első sajátvektor (piaci faktor) loadingja.
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from src.features.variants import CORR_COLS
+
+class RollingCorr:
+    """
+    Rögzített ablakú gördülő kovariancia/korreláció k asset hozamaira.
+    Ring bufferben tartjuk az ablak sorait; az összegek lebegőpontos
+    sodródását `refresh` frissítésenként a bufferből újraszámolással nullázzuk.
+    A hiányzó (NaN) hozamot 0-nak vesszük (nem mozdult az ár).
+    """
+
+    def __init__(self, assets: List[str], window: int = 120, refresh: Optional[int] = None):
+        if window < 2:
+            raise ValueError("window must be >= 2")
+        self.assets = list(assets)
+        self.window = int(window)
+        self.refresh = int(refresh or window * 10)
+        k = len(self.assets)
+        self._buf = np.zeros((self.window, k))
+        self._pos = 0
+        self.count = 0
+        self._s = np.zeros(k)
+        self._ss = np.zeros((k, k))
+        self._since_refresh = 0
+        self._pc1 = np.full(k, 1.0 / np.sqrt(k)) if k else np.zeros(0)
+
+    @property
+    def n(self) -> int:
+        return min(self.count, self.window)
+
+    def update(self, x) -> None:
+        x = np.nan_to_num(np.asarray(x, dtype=np.float64), nan=0.0)
+        old = self._buf[self._pos]
+        if self.count >= self.window:
+            self._s -= old
+            self._ss -= np.outer(old, old)
+        self._s += x
+        self._ss += np.outer(x, x)
+        self._buf[self._pos] = x
+        self._pos = (self._pos + 1) % self.window
+        self.count += 1
+
+        self._since_refresh += 1
+        if self._since_refresh >= self.refresh:
+            rows = self._buf[: self.n]
+            self._s = rows.sum(axis=0)
+            self._ss = rows.T @ rows
+            self._since_refresh = 0
+
+    def cov(self) -> np.ndarray:
+        n = self.n
+        if n < 2:
+            return np.full_like(self._ss, np.nan)
+        return (self._ss - np.outer(self._s, self._s) / n) / (n - 1)
+
+    def corr(self) -> np.ndarray:
+        c = self.cov()
+        sd = np.sqrt(np.clip(np.diag(c), 0.0, None))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = c / np.outer(sd, sd)
+        # konstans (nulla szórású) asset -> nincs korreláció
+        r[~np.isfinite(r)] = 0.0
+        np.clip(r, -1.0, 1.0, out=r)
+        np.fill_diagonal(r, 1.0)
+        return r
+
+    def snapshot(self) -> Dict:
+        return {"assets": list(self.assets), "n": self.n, "cov": self.cov(), "corr": self.corr()}
+
+    def _leading_vector(self, r: np.ndarray, max_iter: int = 20, tol: float = 1e-8) -> np.ndarray:
+        # hatványiteráció az előző bar sajátvektorából indítva: tipikusan pár O(k²) lépés;
+        # ha a két legnagyobb sajátérték túl közel van (lassú konvergencia) -> eigh
+        v = self._pc1
+        for _ in range(max_iter):
+            w = r @ v
+            w /= np.linalg.norm(w)
+            if w @ v < 0:
+                w = -w
+            done = np.abs(w - v).max() < tol
+            v = w
+            if done:
+                break
+        else:
+            v = np.linalg.eigh(r)[1][:, -1]
+        if v.sum() < 0:
+            v = -v
+        self._pc1 = v
+        return v
+
+    def features(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(corr_mean, corr_pc1): átlagos korreláció a többi assettel, PC1 loading."""
+        k = len(self.assets)
+        if self.n < 2 or k < 2:
+            return np.full(k, np.nan), np.full(k, np.nan)
+        r = self.corr()
+        mean = (r.sum(axis=1) - 1.0) / (k - 1)
+        return mean, self._leading_vector(r)
+
+def rolling_corr_features(
+    returns: pd.DataFrame,
+    window: int = 120,
+    min_periods: Optional[int] = None,
+    engine: Optional[RollingCorr] = None,
+) -> pd.DataFrame:
+    """
+    returns: időindexű, asset-oszlopos hozam-tábla (igazított barok).
+    Kimenet hosszú formátumban: time, asset, corr_mean, corr_pc1.
+    engine: meglévő (meleg) engine folytatása csak az új sorokkal.
+    """
+    assets = list(returns.columns)
+    k = len(assets)
+    eng = engine if engine is not None else RollingCorr(assets, window=window)
+    min_periods = int(min_periods or eng.window)
+    x = returns.to_numpy(dtype=np.float64)
+    mean = np.full((len(x), k), np.nan, dtype=np.float32)
+    pc1 = np.full((len(x), k), np.nan, dtype=np.float32)
+    for i in range(len(x)):
+        eng.update(x[i])
+        if eng.n >= min_periods:
+            mean[i], pc1[i] = eng.features()
+    out = pd.DataFrame({
+        "time": np.repeat(returns.index.to_numpy(), k),
+        "asset": np.tile(assets, len(x)),
+        "corr_mean": mean.ravel(),
+        "corr_pc1": pc1.ravel(),
+    })
+    return out.dropna(subset=CORR_COLS).reset_index(drop=True)
+
+def _bar_delta(tf: str) -> pd.Timedelta:
+    """Egy bar hossza a timeframe-ből ("4h", "1d", "15m")."""
+    return pd.Timedelta(int(tf[:-1]), unit={"m": "min", "h": "h", "d": "D"}[tf[-1]])
+
+def _bar_time(time: pd.Series, tf: Optional[str]) -> pd.Series:
+    """
+    Időbélyeg -> igazított bar-idő (UTC, ns; tf nélkül csak egységesítés). Intraday: bar-kezdetre lefelé kerekítve.
+    Napi/hosszabb: a legközelebbi napra kerekítve = a tőzsdei session dátuma; a yfinance
+    a helyi éjfélt adja, ami UTC-ben az előző nap este (pl. ^GDAXI 23:00) vagy a nap
+    hajnala (US) -> lefelé kerekítve az előző nap kripto barjához kerülne.
+    """
+    t = pd.to_datetime(time, utc=True, errors="coerce").astype("datetime64[ns, UTC]")
+    if not tf:
+        return t
+    return t.dt.round(tf) if tf[-1] == "d" else t.dt.floor(tf)
+
+def _bar_closes(df: pd.DataFrame, tf: str) -> pd.Series:
+    """time+close -> igazított bar-időindexű close sor (baronként az utolsó)."""
+    return df["close"].groupby(_bar_time(df["time"], tf)).last()
+
+def aligned_returns(closes: Dict[str, pd.DataFrame], tf: str) -> pd.DataFrame:
+    """
+    closes: asset -> DataFrame(time, close). Igazított bar-időre (_bar_time) rendez
+    (pl. yfinance 1d session-dátum vs. UTC kripto), ffill, majd pct_change.
+    """
+    series = {a: _bar_closes(df, tf) for a, df in closes.items() if not df.empty}
+    if len(series) < 2:
+        return pd.DataFrame()
+    px = pd.DataFrame(series).sort_index().ffill()
+    px.index.name = "time"
+    return px.pct_change().iloc[1:]
+
+class LiveCorr:
+    """
+    Élő (bar-zárásonkénti) korreláció, a batch `aligned_returns` + `rolling_corr_features`
+    eredményével egyezően. Egy t bar csak akkor lép az engine-be, ha minden asset
+    close-a végleges t-re, vagyis mindegyiknek van t-nél nem korábbi bara (horizont);
+    egy később beérkező bar így nem egy már ffill-elt árat hagy hátra. Állapot:
+    assetenként a horizont utáni függő close-ok, az utolsó lépett árvektor és az
+    utolsó `keep` bar kivonatai (`frame`) -> korlátos memória.
+    stale: ennyi barnyi lemaradás után egy asset nem tartja vissza a horizontot
+    (a batch is ffill-lel viszi tovább), így egy leállt adatforrás nem fagyaszt be.
+    """
+
+    def __init__(self, tf: str, window: int = 120, keep: Optional[int] = None, stale: int = 5):
+        self.tf = tf
+        self.window = int(window)
+        self.keep = int(keep or window)
+        self.stale = _bar_delta(tf) * stale
+        self.engine: Optional[RollingCorr] = None
+        self.assets: List[str] = []
+        self.horizon: Optional[pd.Timestamp] = None
+        self.last_px: Optional[pd.Series] = None
+        self.pending: Dict[str, pd.Series] = {}
+        self.seen: Dict[str, pd.Timestamp] = {}
+        self.frame = pd.DataFrame(columns=["time", "asset", *CORR_COLS])
+
+    def _final_until(self) -> pd.Timestamp:
+        latest = max(self.seen.values())
+        return min(t for t in self.seen.values() if latest - t <= self.stale)
+
+    def _trim(self, frame: pd.DataFrame) -> pd.DataFrame:
+        times = frame["time"].unique()
+        if len(times) > self.keep:
+            frame = frame[frame["time"] >= times[-self.keep]]
+        return frame.reset_index(drop=True)
+
+    def prime(self, closes: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """Hidegindítás a teljes close-történetből; visszaadja az összes (végleges) kivonatot."""
+        series = {a: _bar_closes(df, self.tf) for a, df in closes.items() if not df.empty}
+        self.assets = list(series)
+        if len(series) < 2:
+            self.engine = None
+            return self.frame
+        self.seen = {a: s.index[-1] for a, s in series.items()}
+        h = self._final_until()
+        px = pd.DataFrame(series).sort_index().ffill()
+        done = px[px.index <= h]
+        self.pending = {a: s[s.index > h] for a, s in series.items()}
+        self.engine = RollingCorr(self.assets, window=self.window)
+        out = rolling_corr_features(done.pct_change().iloc[1:], engine=self.engine)
+        self.last_px, self.horizon = done.iloc[-1], done.index[-1]
+        self.frame = self._trim(out)
+        return out
+
+    def step(self, closes: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """Új close-ok (asset -> time, close) felvétele; visszaadja az újonnan véglegesült barok kivonatait."""
+        if self.engine is None:
+            return self.frame.iloc[:0]
+        for a, df in closes.items():
+            if a not in self.pending or df.empty:
+                continue
+            s = _bar_closes(df, self.tf)
+            s = s[s.index > self.horizon]
+            if s.empty:
+                continue
+            p = pd.concat([self.pending[a], s])
+            self.pending[a] = p[~p.index.duplicated(keep="last")].sort_index()
+            self.seen[a] = max(self.seen[a], s.index[-1])
+        h = self._final_until()
+        block = pd.DataFrame({a: p[p.index <= h] for a, p in self.pending.items()})
+        if block.empty:
+            return self.frame.iloc[:0]
+        px = pd.concat([self.last_px.to_frame().T, block.sort_index()]).ffill()
+        out = rolling_corr_features(px.pct_change().iloc[1:], engine=self.engine)
+        self.last_px, self.horizon = px.iloc[-1], px.index[-1]
+        self.pending = {a: p[p.index > self.horizon] for a, p in self.pending.items()}
+        self.frame = self._trim(pd.concat([self.frame, out], ignore_index=True))
+        return out
+
+def merge_corr(feat: pd.DataFrame, corr: pd.DataFrame, asset: str, tf: Optional[str] = None) -> pd.DataFrame:
+    """
+    Per-asset korrelációs kivonat hozzáfűzése a feature-ökhöz (backward asof; tf megadva:
+    a sorok igazított bar-idején, mint a korreláció számolásakor). A sorok megmaradnak:
+    a korrelációs ablak bemelegedése előtt a corr oszlopok NaN-ok (a corr variáns
+    loadere dobja őket). Ha az assetnek nincs corr sora, semleges 0.0 (mint a híreknél).
+    """
+    feat = feat.drop(columns=[c for c in CORR_COLS if c in feat.columns])
+    rhs = corr.loc[corr["asset"] == asset, ["time", *CORR_COLS]]
+    if rhs.empty:
+        for c in CORR_COLS:
+            feat[c] = np.float32(0.0)
+        return feat
+    rhs = rhs.assign(_bar=_bar_time(rhs["time"], None)).drop(columns="time")
+    out = pd.merge_asof(feat.assign(_bar=_bar_time(feat["time"], tf)), rhs,
+                        on="_bar", direction="backward")
+    return out.drop(columns="_bar")
@@ -0,0 +1,154 @@
+# src/features/labels.py
+# Címkézés egy menetben NumPy tömbökön: több horizontú forward hozam/előjel
+# és triple-barrier (ATR-skálázott TP/SL + időlimit) címkék. Ahol a jövő hiányos,
+# a diszkrét címkék nullable (pd.NA) értéket kapnak, nem 0-t -> a tanító loader eldobja.
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# ennyi soronként számoljuk a (sor × max_hold) barrier-mátrixot -> korlátos memória
+_BARRIER_CHUNK = 65_536
+
+@dataclass(frozen=True)
+class LabelSpec:
+    horizons: Sequence[int] = (1, 3, 6, 12)
+    barrier: bool = True
+    tp_mult: float = 2.0
+    sl_mult: float = 1.0
+    max_hold: int = 12
+    atr_col: str = "atr14"
+
+    @classmethod
+    def from_cfg(cls, cfg: Optional[Dict]) -> Optional["LabelSpec"]:
+        """config.yaml `labels:` blokk -> LabelSpec (None, ha nincs megadva)."""
+        if not cfg:
+            return None
+        b = cfg.get("barrier")
+        return cls(
+            horizons=tuple(int(h) for h in cfg.get("horizons", cls.horizons)),
+            barrier=bool(b),
+            tp_mult=float((b or {}).get("tp", cls.tp_mult)),
+            sl_mult=float((b or {}).get("sl", cls.sl_mult)),
+            max_hold=int((b or {}).get("max_hold", cls.max_hold)),
+        )
+
+    @property
+    def lookahead(self) -> int:
+        """Hány jövőbeli sor kell a címkékhez."""
+        return max([*self.horizons, self.max_hold if self.barrier else 0, 1])
+
+    def columns(self) -> List[str]:
+        cols = []
+        for h in self.horizons:
+            cols += [f"fwd_ret_{h}", f"fwd_sign_{h}"]
+        if self.barrier:
+            cols += ["tb_label", "tb_bars", "tb_ret"]
+        return cols
+
+def _nullable(values: np.ndarray, valid: np.ndarray) -> pd.arrays.IntegerArray:
+    """Egész tömb + érvényességi maszk -> pandas nullable (Int8/Int16) tömb, NA az érvénytelen sorokon."""
+    return pd.arrays.IntegerArray(values, ~valid)
+
+def horizon_labels(close: np.ndarray, horizons: Sequence[int]) -> Dict[str, np.ndarray]:
+    """
+    fwd_ret_h = close[t+h] / close[t] - 1 (float32, a végén NaN),
+    fwd_sign_h = fwd_ret_h > 0 (nullable Int8, NA ahol fwd_ret_h NaN).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    out: Dict[str, np.ndarray] = {}
+    for h in horizons:
+        r = np.full(n, np.nan, dtype=np.float32)
+        if h < n:
+            r[:-h] = close[h:] / close[:-h] - 1.0
+        out[f"fwd_ret_{h}"] = r
+        out[f"fwd_sign_{h}"] = _nullable((r > 0).astype(np.int8), np.isfinite(r))
+    return out
+
+def _first_hit(mask: np.ndarray) -> np.ndarray:
+    """Soronként az első True indexe, vagy mask.shape[1], ha nincs találat."""
+    idx = mask.argmax(axis=1)
+    idx[~mask.any(axis=1)] = mask.shape[1]
+    return idx
+
+def triple_barrier(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    atr: np.ndarray,
+    tp_mult: float = 2.0,
+    sl_mult: float = 1.0,
+    max_hold: int = 12,
+    chunk: int = _BARRIER_CHUNK,
+) -> Dict[str, np.ndarray]:
+    """
+    Triple-barrier: t-ben belépve felső korlát close + tp*ATR, alsó close - sl*ATR,
+    időlimit max_hold bar. A t+1..t+max_hold high/low ablakot sliding_window_view
+    adja (másolás nélkül), az első érintést soronként argmax keresi.
+
+      tb_label: +1 TP, -1 SL (ha egy baron belül mindkettő -> SL, konzervatív), 0 időlimit
+      tb_bars:  kilépésig eltelt barok
+      tb_ret:   hozam a kilépésnél (korlát szintje vagy a t+max_hold close), float32;
+                NaN, ha a jövő ablak hiányos és nem ért korlátot, vagy nincs ATR
+    Ahol tb_ret NaN, ott tb_label (Int8) és tb_bars (Int16) is NA.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    atr = np.asarray(atr, dtype=np.float64)
+    n, hz = len(close), int(max_hold)
+
+    label = np.zeros(n, dtype=np.int8)
+    bars = np.zeros(n, dtype=np.int16)
+    ret = np.full(n, np.nan, dtype=np.float32)
+    if n == 0 or hz < 1:
+        ok = np.zeros(n, dtype=bool)
+        return {"tb_label": _nullable(label, ok), "tb_bars": _nullable(bars, ok), "tb_ret": ret}
+
+    pad = np.full(hz, np.nan)
+    hw_all = sliding_window_view(np.concatenate([high[1:], pad, [np.nan]]), hz)
+    lw_all = sliding_window_view(np.concatenate([low[1:], pad, [np.nan]]), hz)
+    c_pad = np.concatenate([close, pad])
+
+    up = close + tp_mult * atr
+    dn = close - sl_mult * atr
+    with np.errstate(invalid="ignore"):
+        for s in range(0, n, chunk):
+            e = min(n, s + chunk)
+            t = np.arange(s, e)
+            first_up = _first_hit(hw_all[s:e] >= up[s:e, None])
+            first_dn = _first_hit(lw_all[s:e] <= dn[s:e, None])
+
+            hit_dn = (first_dn <= first_up) & (first_dn < hz)
+            hit_up = (first_up < first_dn)
+            timeout = ~(hit_up | hit_dn)
+            complete = t + hz < n
+            valid = np.isfinite(atr[s:e])
+
+            lab = np.where(hit_up, 1, np.where(hit_dn, -1, 0)).astype(np.int8)
+            r = np.where(hit_up, up[s:e], np.where(hit_dn, dn[s:e], c_pad[t + hz])) / close[s:e] - 1.0
+            r[(timeout & ~complete) | ~valid] = np.nan
+            b = np.where(timeout, np.minimum(hz, n - 1 - t), np.minimum(first_up, first_dn) + 1)
+
+            label[s:e] = np.where(valid, lab, 0)
+            bars[s:e] = np.where(valid, b, 0)
+            ret[s:e] = r
+    ok = np.isfinite(ret)
+    return {"tb_label": _nullable(label, ok), "tb_bars": _nullable(bars, ok), "tb_ret": ret}
+
+def add_labels(df: pd.DataFrame, spec: LabelSpec) -> pd.DataFrame:
+    """Címke oszlopok hozzáadása helyben egy időrendezett feature DataFrame-hez."""
+    close = df["close"].to_numpy(dtype=np.float64)
+    cols = horizon_labels(close, spec.horizons)
+    if spec.barrier:
+        cols.update(triple_barrier(
+            df["high"].to_numpy(), df["low"].to_numpy(), close,
+            df[spec.atr_col].to_numpy(dtype=np.float64),
+            tp_mult=spec.tp_mult, sl_mult=spec.sl_mult, max_hold=spec.max_hold,
+        ))
+    for k, v in cols.items():
+        df[k] = v
+    return df
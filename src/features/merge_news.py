@@ -5,13 +5,13 @@ import pandas as pd
 from loguru import logger
 import yaml
 
+from src.features.variants import NEWS_COLS, FEATURE_ROW_GROUP
+
 RAW_DIR = pathlib.Path("data/raw")
 RAW_NEWS_DIR = pathlib.Path("data/raw_news")
 FEAT_DIR = pathlib.Path("data/features")
 OUT_DIR = FEAT_DIR  # ugyanoda írjuk
 
-NEWS_COLS = ["sent_mean", "sent_pos_ratio", "headline_cnt"]
-
 def _list_latest_news() -> pathlib.Path | None:
     files = sorted(RAW_NEWS_DIR.glob("news_*.parquet"))
     return files[-1] if files else None
@@ -47,6 +47,37 @@ def _agg_news(df_news: pd.DataFrame, window_hours: int = 24) -> pd.DataFrame:
     res = res.dropna(subset=["time"]).sort_values("time")
     return res
 
+def merge_asset_news(feat: pd.DataFrame, agg: pd.DataFrame, asset: str) -> pd.DataFrame:
+    """Egy asset feature-jeihez a hír-aggregátumok hozzáfűzése (backward asof, 48h tolerancia)."""
+    feat["time"] = pd.to_datetime(feat["time"], utc=True, errors="coerce")
+    feat = feat.dropna(subset=["time"]).sort_values("time")
+
+    # --- töröljük az esetleges régi news oszlopokat ---
+    for c in NEWS_COLS:
+        if c in feat.columns:
+            feat.drop(columns=c, inplace=True)
+
+    # --- csak az adott asset hírei ---
+    asset_agg = agg[agg["asset"] == asset] if not agg.empty else agg
+    if not asset_agg.empty:
+        rhs = asset_agg[["time", *NEWS_COLS]].copy()
+        join = pd.merge_asof(
+            feat,
+            rhs,
+            on="time",
+            direction="backward",
+            tolerance=pd.Timedelta("48h"),
+        )
+        for c in NEWS_COLS:
+            if c not in join.columns:
+                join[c] = 0.0
+            join[c] = join[c].fillna(0.0).astype(float)
+    else:
+        join = feat.copy()
+        for c in NEWS_COLS:
+            join[c] = 0.0
+    return join
+
 def merge_latest_news(cfg_path: str | pathlib.Path = "config.yaml", window_hours: int = 24) -> None:
     news_path = _list_latest_news()
     if news_path is None:
@@ -74,36 +105,10 @@ def merge_latest_news(cfg_path: str | pathlib.Path = "config.yaml", window_hours
             if feat.empty:
                 continue
 
-            feat["time"] = pd.to_datetime(feat["time"], utc=True, errors="coerce")
-            feat = feat.dropna(subset=["time"]).sort_values("time")
-
-            # --- töröljük az esetleges régi news oszlopokat ---
-            for c in NEWS_COLS:
-                if c in feat.columns:
-                    feat.drop(columns=c, inplace=True)
-
-            # --- csak az adott asset hírei ---
-            asset_agg = agg[agg["asset"] == asset]
-            if not asset_agg.empty:
-                rhs = asset_agg[["time", *NEWS_COLS]].copy()
-                join = pd.merge_asof(
-                    feat,
-                    rhs,
-                    on="time",
-                    direction="backward",
-                    tolerance=pd.Timedelta("48h"),
-                )
-                for c in NEWS_COLS:
-                    if c not in join.columns:
-                        join[c] = 0.0
-                    join[c] = join[c].fillna(0.0).astype(float)
-            else:
-                join = feat.copy()
-                for c in NEWS_COLS:
-                    join[c] = 0.0
+            join = merge_asset_news(feat, agg, asset)
 
             out = OUT_DIR / f"{asset}_{tf}.parquet"
-            join.to_parquet(out, index=False)
+            join.to_parquet(out, index=False, row_group_size=FEATURE_ROW_GROUP)
             logger.info(f"Merged news -> {out} (window={window_hours}h)")
 
 def main():
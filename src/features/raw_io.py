@@ -0,0 +1,29 @@
+# src/features/raw_io.py
+# Könnyű segédek a nyers (OHLCV) fájlokhoz és a confighoz: nem húzzák be az
+# indikátor-könyvtárat (pandas_ta), így a grid, a pipeline és a tesztek is használhatják.
+from __future__ import annotations
+import pathlib
+from typing import Dict, List
+import pandas as pd
+import yaml
+from loguru import logger
+
+RAW_DIR = pathlib.Path("data/raw")
+
+def load_config(path: str | pathlib.Path = "config.yaml") -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+def _guess_timeframes(asset: str, cfg_tfs: List[str]) -> List[str]:
+    # kriptóknál 4h+1d, a többinél 1d (M1 szabály)
+    return cfg_tfs if asset.upper().endswith("USDT") else ["1d"]
+
+def _load_raw(asset: str, tf: str) -> pd.DataFrame:
+    p = RAW_DIR / f"{asset}_{tf}.parquet"
+    if not p.exists():
+        logger.warning(f"Missing raw file: {p}")
+        return pd.DataFrame(columns=["time","open","high","low","close","volume"])
+    df = pd.read_parquet(p)
+    # biztos UTC datetime
+    df["time"] = pd.to_datetime(df["time"], utc=True, errors="coerce")
+    return df
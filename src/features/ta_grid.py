@@ -0,0 +1,157 @@
+# src/features/ta_grid.py
+# Indikátor-paraméter rács feature-kutatáshoz: teljes családok (SMA/EMA/RSI/ATR
+# sok hosszal + hozam-lagok) egy menetben, NumPy-ban, egyetlen float32 blokkba.
+from __future__ import annotations
+import pathlib
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.features.raw_io import RAW_DIR, _guess_timeframes, _load_raw, load_config
+from src.features.variants import FEATURE_ROW_GROUP
+
+OUT_DIR = pathlib.Path("data/features/grid")
+
+# EWM blokkmérete: blokkon belül zárt alak (mátrixszorzás), blokkok között rekurzió
+_EWM_BLOCK = 128
+
+@dataclass(frozen=True)
+class GridSpec:
+    """Alapból 40 SMA + 40 EMA + 30 RSI + 30 ATR + 60 hozam-lag = 200 oszlop."""
+    sma: Sequence[int] = tuple(range(5, 205, 5))
+    ema: Sequence[int] = tuple(range(5, 205, 5))
+    rsi: Sequence[int] = tuple(range(2, 62, 2))
+    atr: Sequence[int] = tuple(range(2, 62, 2))
+    ret_lags: Sequence[int] = tuple(range(1, 61))
+
+    def names(self) -> List[str]:
+        return ([f"sma{n}" for n in self.sma] + [f"ema{n}" for n in self.ema]
+                + [f"rsi{n}" for n in self.rsi] + [f"atr{n}" for n in self.atr]
+                + [f"ret_{n}" for n in self.ret_lags])
+
+def _ewm_many(x: np.ndarray, alphas: np.ndarray, block: int = _EWM_BLOCK) -> np.ndarray:
+    """
+    y_t = a*x_t + (1-a)*y_{t-1}, y_0 = x_0 (pandas ewm(adjust=False)) egyszerre
+    sok alphára. Blokkonként egy (K,B,B)@(B,nb) szorzás adja a nulla kezdőállapotú
+    választ, a blokkhatáron átvitt állapot (1-a)^(i+1) súllyal adódik hozzá.
+    Kimenet: (n, K) float64.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    a = np.asarray(alphas, dtype=np.float64)
+    n, k = len(x), len(a)
+    if n == 0 or k == 0:
+        return np.empty((n, k))
+    d = 1.0 - a
+
+    nb = -(-n // block)
+    xp = np.zeros(nb * block)
+    xp[:n] = x
+    xb = xp.reshape(nb, block).T                        # (B, nb)
+
+    i = np.arange(block)
+    e = i[:, None] - i[None, :]
+    w = np.where(e >= 0, a[:, None, None] * d[:, None, None] ** np.maximum(e, 0), 0.0)
+    local = w @ xb                                      # (K, B, nb)
+    carry = d[:, None] ** (i + 1)                       # (K, B)
+
+    prev = np.full(k, x[0])
+    for j in range(nb):
+        local[:, :, j] += carry * prev[:, None]
+        prev = local[:, -1, j]
+    return local.transpose(2, 1, 0).reshape(nb * block, k)[:n]
+
+def _fill_sma(out: np.ndarray, col: int, x: np.ndarray, lengths: Sequence[int]) -> int:
+    cs = np.concatenate([[0.0], np.cumsum(x)])
+    for n in lengths:
+        v = out[:, col]
+        v[: n - 1] = np.nan
+        v[n - 1:] = (cs[n:] - cs[:-n]) / n
+        col += 1
+    return col
+
+def _fill_ewm(out: np.ndarray, col: int, y: np.ndarray, lengths: Sequence[int], first: int) -> int:
+    """y: (n-first, K) ewm eredmény; az első `length` megfigyelésig NaN (min_periods)."""
+    k = y.shape[1]
+    out[:first, col:col + k] = np.nan
+    out[first:, col:col + k] = y
+    for j, n in enumerate(lengths):
+        out[: first + n - 1, col + j] = np.nan
+    return col + k
+
+def compute_indicator_grid(df: pd.DataFrame, spec: GridSpec = GridSpec()) -> Tuple[np.ndarray, List[str]]:
+    """
+    Teljes indikátor-rács egy (n, F) float32 blokkba, időrendezett, NaN-mentes
+    OHLC bemenetre (egy NaN close a kumulált összegen / EWM blokkon át az egész
+    oszlopot elrontaná -> a grid_frame előtte kiszűri a hiányos sorokat).
+      - SMA: kumulált összeg különbsége (O(n) hosszanként, pandas nélkül)
+      - EMA: ewm(span=n, adjust=False), első n-1 NaN
+      - RSI: Wilder RMA (alpha=1/n, adjust=False) a gain/loss sorokon
+      - ATR: Wilder RMA a true range-en
+      - ret_n: close[t] / close[t-n] - 1
+    """
+    close = df["close"].to_numpy(dtype=np.float64)
+    high = df["high"].to_numpy(dtype=np.float64)
+    low = df["low"].to_numpy(dtype=np.float64)
+    n = len(close)
+    names = spec.names()
+    out = np.empty((n, len(names)), dtype=np.float32)
+    if n == 0:
+        return out, names
+
+    col = _fill_sma(out, 0, close, spec.sma)
+
+    ema_len = np.asarray(spec.ema, dtype=np.float64)
+    col = _fill_ewm(out, col, _ewm_many(close, 2.0 / (ema_len + 1.0)), spec.ema, first=0)
+
+    # RSI / ATR: az 1. sortól értelmezett (diff / előző close kell)
+    if spec.rsi:
+        delta = np.diff(close)
+        alphas = 1.0 / np.asarray(spec.rsi, dtype=np.float64)
+        g = _ewm_many(np.clip(delta, 0.0, None), alphas)
+        l = _ewm_many(np.clip(-delta, 0.0, None), alphas)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rsi = 100.0 * g / (g + l)
+        col = _fill_ewm(out, col, rsi, spec.rsi, first=1)
+    if spec.atr:
+        pc = close[:-1]
+        tr = np.maximum(high[1:] - low[1:], np.maximum(np.abs(high[1:] - pc), np.abs(low[1:] - pc)))
+        alphas = 1.0 / np.asarray(spec.atr, dtype=np.float64)
+        col = _fill_ewm(out, col, _ewm_many(tr, alphas), spec.atr, first=1)
+
+    for lag in spec.ret_lags:
+        v = out[:, col]
+        v[:lag] = np.nan
+        v[lag:] = close[lag:] / close[:-lag] - 1.0
+        col += 1
+    return out, names
+
+def grid_frame(df: pd.DataFrame, spec: GridSpec = GridSpec()) -> pd.DataFrame:
+    """time + rács oszlopok; a DataFrame egyetlen float32 blokkból épül. Hiányos OHLC sorok nélkül."""
+    df = df.dropna(subset=["time", "high", "low", "close"]).sort_values("time").reset_index(drop=True)
+    block, names = compute_indicator_grid(df, spec)
+    out = pd.DataFrame(block, columns=names, copy=False)
+    out.insert(0, "time", df["time"].to_numpy())
+    return out
+
+def build_grid_all(cfg_path: str | pathlib.Path = "config.yaml", spec: GridSpec = GridSpec()) -> None:
+    cfg = load_config(cfg_path)
+    cfg_tfs: List[str] = cfg.get("timeframes", ["4h", "1d"])
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Building indicator grid ({len(spec.names())} cols) from {RAW_DIR}…")
+    for asset in cfg["assets"]:
+        for tf in _guess_timeframes(asset, cfg_tfs):
+            raw = _load_raw(asset, tf)
+            if raw.empty:
+                continue
+            g = grid_frame(raw, spec)
+            out = OUT_DIR / f"{asset}_{tf}.parquet"
+            g.to_parquet(out, index=False, row_group_size=FEATURE_ROW_GROUP)
+            logger.info(f"Saved grid {asset} {tf}: {g.shape} -> {out}")
+
+def main():
+    build_grid_all()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# src/features/variants.py
+# Feature-variánsok: melyik modellváltozat pontosan mely oszlopokat használja.
+# A loaderek ezt a projekciót (és az időszűrést) a parquet olvasásba tolják le,
+# így a memória/I/O a variánssal skálázódik, nem a legszélesebb feature-fájllal.
+from __future__ import annotations
+import pathlib
+from typing import Dict, List, Optional
+import pandas as pd
+import pyarrow.parquet as pq
+from loguru import logger
+
+FEAT_DIR = pathlib.Path("data/features")
+
+# Kisebb row groupok -> az időszűrés a statisztikák alapján egész blokkokat ugorhat át
+FEATURE_ROW_GROUP = 50_000
+
+TIME_COL = "time"
+# Feature-fájl séma: a legfrissebb bar(ok) sora is benne van (élő inferencia), de a
+# jövője még ismeretlen -> target_ret NaN, target_sign (nullable Int8) és a címkék
+# (fwd_*, tb_*) NA. Tanításhoz csak a címkézett sorok kellenek: load_features(labeled=True).
+TARGET_COLS = ["target_ret", "target_sign"]
+LABEL_PREFIXES = ("fwd_ret_", "fwd_sign_", "tb_")
+
+TA_COLS = ["sma10", "sma50", "rsi14", "macd_hist", "atr14", "obv",
+           "sma_cross", "ret_1", "ret_5"]
+NEWS_COLS = ["sent_mean", "sent_pos_ratio", "headline_cnt"]
+CORR_COLS = ["corr_mean", "corr_pc1"]
+# ár-/volumenszintű oszlopok: assetenként más skála -> közös (több assetes) modellbe nem valók
+PRICE_LEVEL_COLS = ["sma10", "sma50", "macd_hist", "atr14", "obv"]
+
+VARIANTS: Dict[str, List[str]] = {
+    "base": TA_COLS,
+    "news": NEWS_COLS,
+    "base_news": TA_COLS + NEWS_COLS,
+    "base_news_corr": TA_COLS + NEWS_COLS + CORR_COLS,
+}
+
+def feature_columns(variant: str) -> List[str]:
+    """A variáns modell-bemenő oszlopai (idő és target nélkül)."""
+    try:
+        return list(VARIANTS[variant])
+    except KeyError:
+        raise ValueError(f"Unknown variant: {variant} (known: {sorted(VARIANTS)})") from None
+
+def scale_free_columns(variant: str) -> List[str]:
+    """A variáns oszlopai az ár-/volumenszintűek nélkül (közös modell bemenete)."""
+    return [c for c in feature_columns(variant) if c not in PRICE_LEVEL_COLS]
+
+def variant_columns(variant: str, target: bool = True) -> List[str]:
+    """Az olvasandó oszlopok: time + feature-ök (+ target)."""
+    cols = [TIME_COL, *feature_columns(variant)]
+    if target:
+        cols += TARGET_COLS
+    return cols
+
+def is_label_column(col: str) -> bool:
+    """Target vagy címke oszlop (a jövőből számolt, a legfrissebb soroknál NA)."""
+    return col in TARGET_COLS or col.startswith(LABEL_PREFIXES)
+
+def _utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+def load_features(
+    asset: str,
+    tf: str,
+    variant: str = "base_news",
+    start=None,
+    end=None,
+    target: bool = True,
+    columns: Optional[List[str]] = None,
+    strict: bool = False,
+    labeled: bool = False,
+) -> pd.DataFrame:
+    """
+    Feature-fájl olvasása a variáns oszlopaival és opcionális [start, end) időablakkal.
+    A projekció és a szűrő a pyarrow olvasóba kerül (nem pandas-ban vágunk utólag).
+    Az asset/timeframe oszlopokat nem olvassuk: fájlonként konstansok.
+    strict: hiányzó oszlop -> ValueError (modell-bemenet: tanítás és inferencia
+    ugyanazt a mátrixot kapja), különben warning és a meglévő oszlopok.
+    labeled: csak az ismert jövőjű sorok (egyik olvasott target/címke sem NA) -> tanítás.
+    """
+    p = FEAT_DIR / f"{asset}_{tf}.parquet"
+    if not p.exists():
+        return pd.DataFrame()
+
+    want = list(columns) if columns is not None else variant_columns(variant, target=target)
+    have = set(pq.read_schema(p).names)
+    missing = [c for c in want if c not in have]
+    if missing:
+        if strict:
+            raise ValueError(f"{p}: missing columns for variant {variant}: {missing}")
+        logger.warning(f"{p}: missing columns for variant {variant}: {missing}")
+    cols = [c for c in want if c in have]
+
+    filters = []
+    if start is not None:
+        filters.append((TIME_COL, ">=", _utc(start)))
+    if end is not None:
+        filters.append((TIME_COL, "<", _utc(end)))
+
+    df = pq.read_table(p, columns=cols, filters=filters or None).to_pandas()
+    if TIME_COL in df.columns:
+        df[TIME_COL] = pd.to_datetime(df[TIME_COL], utc=True, errors="coerce")
+    # a korrelációs ablak bemelegedése alatti sorok (NaN corr) csak a corr variánsból esnek ki
+    drop = [c for c in CORR_COLS if c in df.columns]
+    if labeled:
+        drop += [c for c in df.columns if is_label_column(c)]
+    if drop:
+        df = df.dropna(subset=drop).reset_index(drop=True)
+    return df
@@ -0,0 +1,200 @@
+# src/models/registry.py
+# Modell-artefaktok folyamaton belüli cache-e: LRU a deszerializált modellekre
+# (asset/tf/model/variant + fájl-ujjlenyomat), hot-reload, ha az artefakt változik,
+# és valószínűség-memo feature-fájl verziónként. Így az ismételt jelgenerálás
+# (pl. küszöb-tuning) már csak tömbművelet.
+from __future__ import annotations
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import joblib
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.features import variants
+from src.features.variants import feature_columns, load_features
+
+MODELS_DIR = pathlib.Path("models")
+# közös (több assetre illesztett) modell "assetje": models/ALL_{tf}_{model}_{variant}.joblib
+# (train_parallel --shared írja, config: train_shared); ilyenkor minden pár ezt az egy
+# artefaktot használja, és egy predict_proba hívást kap
+SHARED = "ALL"
+
+Key = Tuple[str, str, str, str]          # (asset, tf, model, variant)
+Fingerprint = Tuple[int, int]            # (mtime_ns, size)
+# (ujjlenyomat, becslő, feature-oszlopok, tanító/holdout határ)
+Entry = Tuple[Fingerprint, Any, List[str], Optional[pd.Timestamp]]
+
+def artifact_path(asset: str, tf: str, model: str, variant: str) -> pathlib.Path:
+    return MODELS_DIR / f"{asset}_{tf}_{model}_{variant}.joblib"
+
+def resolve_artifact(asset: str, tf: str, model: str, variant: str,
+                     shared: bool = False) -> Tuple[str, pathlib.Path]:
+    """
+    Pontosan egy artefakt: shared -> a timeframe közös modellje, különben a saját.
+    Nincs tartalék a másikra: egy régi per-asset fájl nem takarhatja el a közös modellt.
+    """
+    owner = SHARED if shared else asset
+    return owner, artifact_path(owner, tf, model, variant)
+
+def fingerprint(p: pathlib.Path) -> Optional[Fingerprint]:
+    try:
+        st = p.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _unpack(obj: Any, variant: str) -> Tuple[Any, List[str], Optional[pd.Timestamp]]:
+    """Artefakt: vagy maga a becslő, vagy dict(model=..., features=[...], cutoff=...)."""
+    if isinstance(obj, dict):
+        cutoff = obj.get("cutoff")
+        return (obj["model"], list(obj.get("features") or feature_columns(variant)),
+                None if cutoff is None else pd.Timestamp(cutoff))
+    return obj, feature_columns(variant), None
+
+class ModelRegistry:
+    def __init__(self, maxsize: int = 64, prob_maxsize: int = 256):
+        self.maxsize = maxsize
+        self.prob_maxsize = prob_maxsize
+        self._models: "OrderedDict[Key, Entry]" = OrderedDict()
+        self._probs: "OrderedDict[Tuple[Key, str, Fingerprint, Fingerprint], pd.DataFrame]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.loads = 0
+
+    def get(self, asset: str, tf: str, model: str, variant: str,
+            shared: bool = False) -> Entry:
+        """(ujjlenyomat, becslő, feature-oszlopok, cutoff); újratölt, ha az artefakt megváltozott."""
+        return self._get(*self._resolve(asset, tf, model, variant, shared))
+
+    def cutoff(self, asset: str, tf: str, model: str, variant: str,
+               shared: bool = False) -> Optional[pd.Timestamp]:
+        """
+        A modell tanító/holdout határa (train_parallel --holdout): a tanítás csak előtte
+        lévő sorokat látott, értékelni ettől (>=) szabad. None: az artefakt nem tárolja.
+        """
+        return self.get(asset, tf, model, variant, shared)[3]
+
+    def _resolve(self, asset: str, tf: str, model: str, variant: str,
+                 shared: bool = False) -> Tuple[Key, pathlib.Path]:
+        owner, p = resolve_artifact(asset, tf, model, variant, shared)
+        return (owner, tf, model, variant), p
+
+    def _get(self, key: Key, p: pathlib.Path) -> Entry:
+        variant = key[3]
+        fp = fingerprint(p)
+        if fp is None:
+            raise FileNotFoundError(p)
+        with self._lock:
+            hit = self._models.get(key)
+            if hit is not None and hit[0] == fp:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return hit
+        est, cols, cutoff = _unpack(joblib.load(p), variant)
+        entry = (fp, est, cols, cutoff)
+        with self._lock:
+            if hit is not None:
+                logger.info(f"Model artifact changed, reloaded: {p}")
+            self._models[key] = entry
+            self._models.move_to_end(key)
+            while len(self._models) > self.maxsize:
+                self._models.popitem(last=False)
+            self.loads += 1
+        return entry
+
+    def predict_proba(self, asset: str, tf: str, model: str, variant: str = "base_news",
+                      shared: bool = False) -> pd.DataFrame:
+        """
+        DataFrame(time, p_buy). Memoizálva (modell-, feature-fájl ujjlenyomat) szerint;
+        a visszaadott frame közös a cache-sel -> csak olvasásra.
+        """
+        return self.predict_proba_many([(asset, tf)], model, variant, shared=shared)[(asset, tf)]
+
+    def predict_proba_many(
+        self, pairs: Iterable[Tuple[str, str]], model: str, variant: str = "base_news",
+        skip_missing: bool = False, shared: bool = False,
+    ) -> Dict[Tuple[str, str], pd.DataFrame]:
+        """
+        Batch-inferencia: az azonos artefaktra feloldódó asset×tf párok feature-mátrixait
+        egymás alá rakjuk, modellenként EGY predict_proba hívás, majd offsetek mentén
+        visszaosztjuk. A memo-találatokat nem számoljuk újra.
+        skip_missing: hiányzó artefakt/feature-fájl esetén a párt kihagyjuk (warning).
+        shared: a timeframe közös modellje (config: train_shared), lásd resolve_artifact.
+        """
+        out: Dict[Tuple[str, str], pd.DataFrame] = {}
+        groups: Dict[Key, List[Tuple[Tuple[str, str], Fingerprint]]] = {}
+        models: Dict[Key, Entry] = {}
+
+        for asset, tf in pairs:
+            key, p = self._resolve(asset, tf, model, variant, shared)
+            feat_p = variants.FEAT_DIR / f"{asset}_{tf}.parquet"
+            feat_fp = fingerprint(feat_p)
+            try:
+                if feat_fp is None:
+                    raise FileNotFoundError(feat_p)
+                if key not in models:
+                    models[key] = self._get(key, p)
+            except FileNotFoundError as e:
+                if not skip_missing:
+                    raise
+                logger.warning(f"Skip {asset} {tf}: {e}")
+                continue
+            mkey = ((asset, tf, model, variant), key[0], models[key][0], feat_fp)
+            with self._lock:
+                cached = self._probs.get(mkey)
+                if cached is not None:
+                    self._probs.move_to_end(mkey)
+                    out[(asset, tf)] = cached
+                    continue
+            groups.setdefault(key, []).append(((asset, tf), feat_fp))
+
+        for key, members in groups.items():
+            model_fp, est, cols, _ = models[key]
+            times, blocks = [], []
+            for (asset, tf), _ in members:
+                # az artefakt pontos oszloplistája; hiányzó oszlop -> ValueError
+                df = load_features(asset, tf, variant, target=False, columns=["time", *cols],
+                                   strict=True)
+                times.append(df["time"])
+                blocks.append(df[cols].to_numpy(dtype=np.float64))
+            p_buy = est.predict_proba(np.vstack(blocks))[:, 1] if blocks else np.empty(0)
+
+            offsets = np.cumsum([0, *(len(b) for b in blocks)])
+            with self._lock:
+                for i, ((asset, tf), feat_fp) in enumerate(members):
+                    res = pd.DataFrame({"time": times[i],
+                                        "p_buy": p_buy[offsets[i]:offsets[i + 1]]})
+                    out[(asset, tf)] = res
+                    self._probs[((asset, tf, model, variant), key[0], model_fp, feat_fp)] = res
+                while len(self._probs) > self.prob_maxsize:
+                    self._probs.popitem(last=False)
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._probs.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"models": len(self._models), "probs": len(self._probs),
+                    "hits": self.hits, "loads": self.loads}
+
+# folyamatonkénti alapértelmezett registry
+REGISTRY = ModelRegistry()
+
+def predict_proba(asset: str, tf: str, model_type: str = "logreg", variant: str = "base_news",
+                  shared: bool = False) -> pd.DataFrame:
+    return REGISTRY.predict_proba(asset, tf, model_type, variant, shared)
+
+def cutoff(asset: str, tf: str, model_type: str = "logreg", variant: str = "base_news",
+           shared: bool = False) -> Optional[pd.Timestamp]:
+    return REGISTRY.cutoff(asset, tf, model_type, variant, shared)
+
+def predict_proba_many(pairs: Iterable[Tuple[str, str]], model_type: str = "logreg",
+                       variant: str = "base_news", skip_missing: bool = False,
+                       shared: bool = False) -> Dict[Tuple[str, str], pd.DataFrame]:
+    return REGISTRY.predict_proba_many(pairs, model_type, variant, skip_missing, shared)
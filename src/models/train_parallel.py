@@ -0,0 +1,248 @@
+# src/models/train_parallel.py
+# Párhuzamos logreg/rf tanítás asset×tf páronként. A feature-mátrixokat a szülő
+# egyszer tölti be és shared memory-ba teszi; a workerek csak a szegmens nevét
+# kapják (nincs DataFrame-pickle), és zero-copy NumPy nézetként olvassák.
+# Worker-enkénti szálszám (BLAS env + threadpoolctl, rf n_jobs) -> nincs túlfoglalás.
+# --shared: timeframe-enként egy közös modell az összes asset sorain
+# (models/ALL_{tf}_...), amit a registry batch-inferenciája egy hívással kiszolgál.
+# --holdout: csak az időbeli határ (cutoff) előtti sorokon tanul (a címke-horizonttal
+# purge-olva); a cutoff az artefaktba kerül, a tuning/backtest csak utána értékel.
+from __future__ import annotations
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import joblib
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.features.labels import LabelSpec
+from src.features.raw_io import load_config
+from src.features.variants import PRICE_LEVEL_COLS, feature_columns, load_features, scale_free_columns
+from src.models.registry import SHARED, artifact_path
+
+MODELS = ("logreg", "rf")
+TARGET = "target_sign"
+# az idősor utolsó ekkora hányada holdout (config: train_holdout)
+HOLDOUT = 0.3
+_THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+               "BLIS_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+# (shm név, shape, dtype)
+ArraySpec = Tuple[str, Tuple[int, ...], str]
+
+def make_estimator(model: str, n_jobs: int = 1):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    if model == "logreg":
+        return make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000))
+    if model == "rf":
+        return RandomForestClassifier(n_estimators=300, min_samples_leaf=5,
+                                      n_jobs=n_jobs, random_state=42)
+    raise ValueError(f"Unsupported model for training: {model} (known: {MODELS})")
+
+def label_horizon(target: str) -> int:
+    """A target előretekintése barban: a cutoff előtti utolsó ennyi sor címkéje már a holdoutba lát."""
+    if target.startswith(("fwd_ret_", "fwd_sign_")):
+        return int(target.rsplit("_", 1)[1])
+    if target.startswith("tb_"):
+        return (LabelSpec.from_cfg(load_config().get("labels")) or LabelSpec()).max_hold
+    return 1
+
+def holdout_cutoff(pairs: List[Tuple[str, str]], frac: float) -> Optional[pd.Timestamp]:
+    """
+    Tanító/holdout határ: a párok (összevont) időbélyegeinek (1 - frac) kvantilise.
+    Közös modellnél így minden asset ugyanattól az időponttól holdout. frac <= 0 -> None.
+    """
+    if frac <= 0:
+        return None
+    times = [load_features(a, t, columns=["time"])["time"] for a, t in pairs]
+    times = pd.concat([s for s in times if len(s)] or [pd.Series([], dtype="datetime64[ns, UTC]")])
+    if times.empty:
+        return None
+    times = times.sort_values(ignore_index=True)
+    return times.iloc[min(int(len(times) * (1 - frac)), len(times) - 1)]
+
+def load_matrix(asset: str, tf: str, variant: str, target: str = TARGET,
+                columns: Optional[List[str]] = None, cutoff: Optional[pd.Timestamp] = None,
+                purge: int = 0) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    (X float64 C-rendben, y int8, oszlopok) a variáns oszlopaiból; NaN-os sorok nélkül.
+    A címke-targetek (fwd_sign_h, tb_label) hiányos jövőjű sorai NA-k -> itt kiesnek.
+    columns: a variáns helyett pontosan ezek az oszlopok (pl. közös modell).
+    cutoff: csak az előtte lévő sorok, és közülük az utolsó `purge` sor sem
+    (a címkéjük a cutoff utáni árakból számol).
+    """
+    cols = list(columns) if columns is not None else feature_columns(variant)
+    # strict: a teljes variáns kell, nem egy csendben szűkített oszlopkészlet;
+    # labeled: a legfrissebb (még címkézetlen) sorok kimaradnak
+    df = load_features(asset, tf, variant, columns=["time", *cols, target], strict=True,
+                       labeled=True)
+    if df.empty:
+        return np.empty((0, 0)), np.empty(0, dtype=np.int8), []
+    df = df.dropna(subset=[*cols, target])
+    if cutoff is not None:
+        df = df[df["time"] < cutoff]
+        df = df.iloc[:max(len(df) - purge, 0)]
+    X = np.ascontiguousarray(df[cols].to_numpy(dtype=np.float64))
+    return X, df[target].to_numpy(dtype=np.int8), cols
+
+def load_pooled(pairs: List[Tuple[str, str]], variant: str, target: str = TARGET,
+                cutoff: Optional[pd.Timestamp] = None, purge: int = 0
+                ) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    A párok mátrixai egymás alá rakva, csak a skálafüggetlen oszlopokkal: az ár-/volumen-
+    szintű feature-ök (PRICE_LEVEL_COLS) assetenként más nagyságrendűek, a közös modell
+    nem kapja őket. Az artefakt ezt a szűkebb listát tárolja -> az inferencia is ezt olvassa.
+    """
+    cols = scale_free_columns(variant)
+    dropped = [c for c in feature_columns(variant) if c in PRICE_LEVEL_COLS]
+    if dropped:
+        logger.info(f"Shared model: price-level columns left out {dropped}")
+    parts = [load_matrix(a, t, variant, target, columns=cols, cutoff=cutoff, purge=purge)
+             for a, t in pairs]
+    parts = [p for p in parts if len(p[1])]
+    if not parts:
+        return np.empty((0, 0)), np.empty(0, dtype=np.int8), []
+    X = np.vstack([p[0] for p in parts])
+    return np.ascontiguousarray(X), np.concatenate([p[1] for p in parts]), parts[0][2]
+
+def _share(arr: np.ndarray) -> Tuple[shared_memory.SharedMemory, ArraySpec]:
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    return shm, (shm.name, arr.shape, arr.dtype.str)
+
+def _limit_threads(threads: int) -> None:
+    """Worker initializer: BLAS/OpenMP szálak korlátozása (env + már betöltött könyvtárak)."""
+    for k in _THREAD_ENV:
+        os.environ[k] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+
+def _fit_one(asset: str, tf: str, model: str, variant: str, x: ArraySpec, y: ArraySpec,
+             cols: List[str], threads: int, cutoff: Optional[pd.Timestamp] = None
+             ) -> Tuple[str, str, int, float]:
+    t0 = time.perf_counter()
+    shms = [shared_memory.SharedMemory(name=s[0]) for s in (x, y)]
+    try:
+        X = np.ndarray(x[1], dtype=np.dtype(x[2]), buffer=shms[0].buf)
+        Y = np.ndarray(y[1], dtype=np.dtype(y[2]), buffer=shms[1].buf)
+        est = make_estimator(model, n_jobs=threads).fit(X, Y)
+        n = len(Y)
+        del X, Y
+    finally:
+        for s in shms:
+            s.close()
+    out = artifact_path(asset, tf, model, variant)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(".tmp")
+    joblib.dump({"model": est, "features": cols, "cutoff": cutoff}, tmp)
+    tmp.replace(out)
+    return asset, tf, n, time.perf_counter() - t0
+
+def train_many(pairs: List[Tuple[str, str]], model: str, variant: str = "base_news",
+               workers: Optional[int] = None, threads: Optional[int] = None,
+               target: str = TARGET, shared: bool = False,
+               holdout: float = HOLDOUT) -> Dict[Tuple[str, str], int]:
+    """
+    Minden párra egy fit a process poolban. workers × threads ≈ CPU-szám;
+    threads alapértelmezés: cpu // workers. Visszaad: {(asset, tf): tanító sorok}.
+    shared: timeframe-enként egy fit a párok összevont sorain, kulcs: (SHARED, tf).
+    holdout: az idősor utolsó hányada kimarad a tanításból (lásd holdout_cutoff).
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unsupported model for training: {model} (known: {MODELS})")
+    groups: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+    for asset, tf in pairs:
+        groups.setdefault((SHARED, tf) if shared else (asset, tf), []).append((asset, tf))
+    cpu = os.cpu_count() or 1
+    workers = max(1, min(workers or cpu, len(groups) or 1))
+    threads = max(1, threads or cpu // workers)
+    purge = label_horizon(target)
+
+    segments: List[shared_memory.SharedMemory] = []
+    tasks = []
+    try:
+        for (asset, tf), members in groups.items():
+            try:
+                cutoff = holdout_cutoff(members, holdout)
+                X, y, cols = (load_pooled(members, variant, target, cutoff, purge) if shared
+                              else load_matrix(asset, tf, variant, target, cutoff=cutoff, purge=purge))
+            except ValueError as e:
+                logger.warning(f"Skip {asset} {tf}: {e}")
+                continue
+            if len(y) == 0 or len(np.unique(y)) < 2:
+                logger.warning(f"Skip {asset} {tf}: no usable training rows")
+                continue
+            (sx, x_spec), (sy, y_spec) = _share(X), _share(y)
+            segments += [sx, sy]
+            tasks.append((asset, tf, model, variant, x_spec, y_spec, cols, threads, cutoff))
+            if cutoff is not None:
+                logger.info(f"{asset} {tf}: training before {cutoff} (holdout {holdout:.0%}, purge {purge})")
+            del X, y
+
+        done: Dict[Tuple[str, str], int] = {}
+        t0 = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_limit_threads,
+                                 initargs=(threads,)) as ex:
+            futs = {ex.submit(_fit_one, *t): t[:2] for t in tasks}
+            for f in as_completed(futs):
+                asset, tf = futs[f]
+                try:
+                    _, _, n, sec = f.result()
+                except Exception as e:
+                    logger.error(f"Fit failed {asset} {tf}: {e}")
+                    continue
+                done[(asset, tf)] = n
+                logger.info(f"Fitted {model} {asset} {tf} ({n:,} rows, {sec:.1f}s)")
+        logger.info(f"Trained {len(done)}/{len(tasks)} models in {time.perf_counter() - t0:.1f}s "
+                    f"({workers} workers × {threads} threads)")
+        return done
+    finally:
+        for s in segments:
+            s.close()
+            s.unlink()
+
+def _parse_pair(s: str) -> Tuple[str, str]:
+    asset, _, tf = s.rpartition(":")
+    if not asset:
+        raise ValueError(f"Expected ASSET:TF, got {s!r}")
+    return asset, tf
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pairs", nargs="*", default=None, help="ASSET:TF lista (alapértelmezés: config)")
+    ap.add_argument("--model", choices=list(MODELS), default="logreg")
+    ap.add_argument("--variant", default="base_news")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--threads", type=int, default=None, help="szál / worker (BLAS, rf n_jobs)")
+    ap.add_argument("--target", default=TARGET)
+    ap.add_argument("--shared", action="store_true",
+                    help="timeframe-enként egy közös modell (models/ALL_{tf}_...) a párok összes során")
+    ap.add_argument("--holdout", type=float, default=HOLDOUT,
+                    help="az idősor utolsó hányada holdout (0 = teljes minta, in-sample értékelés)")
+    args = ap.parse_args()
+
+    if args.pairs:
+        pairs = [_parse_pair(p) for p in args.pairs]
+    else:
+        from src.signals.generate import _configured_pairs
+        pairs = _configured_pairs()
+    done = train_many(pairs, args.model, args.variant, args.workers, args.threads, args.target,
+                      shared=args.shared, holdout=args.holdout)
+    want = {(SHARED, t) for _, t in pairs} if args.shared else set(pairs)
+    if len(done) < len(want):
+        # nem nulla kilépési kód: a pipeline a hiányzó párokat "failed"-ként kezeli
+        logger.error(f"{len(want) - len(done)} models not trained")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+# src/news/dedup.py
+# Közel-duplikált hírek összevonása: karakter-shingle -> MinHash -> LSH sávok ->
+# union-find. Ugyanaz a sztori NewsAPI-ból, több RSS-ből és retweetekből egy
+# cluster_id-t kap; a pontozás és az aggregálás clusterenként egyszer történik.
+# Az aláírás-index (data/raw_news/minhash_index.npz) snapshotok között megmarad,
+# így a cluster_id stabil és a már pontozott clusterek VADER score-ja újrahasznosul.
+from __future__ import annotations
+import hashlib
+import pathlib
+import re
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+INDEX_PATH = pathlib.Path("data/raw_news/minhash_index.npz")
+
+SHINGLE = 5          # karakter k-gram
+NUM_PERM = 128       # MinHash permutációk
+BANDS = 32           # LSH sávok (soronként NUM_PERM // BANDS érték) -> jelölt-küszöb ~0.42
+THRESHOLD = 0.6      # becsült Jaccard, ami felett két hír ugyanaz a sztori
+MAX_AGE_HOURS = 72   # ennél régebbi aláírások kiesnek az indexből
+CHUNK_ELEMS = 4_000_000
+
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_RT = re.compile(r"^\s*rt\s+@\w+:?\s*")
+_NON_ALNUM = re.compile(r"[\W_]+")
+
+def normalize(text: str) -> str:
+    """Kisbetű, URL-ek, "RT @user:" előtag és írásjelek nélkül, egy szóközzel."""
+    t = _URL.sub(" ", (text or "").lower())
+    t = _RT.sub("", t)
+    return _NON_ALNUM.sub(" ", t).strip()
+
+def text_key(norm: str) -> int:
+    """Stabil 64 bites kulcs a pontos egyezéshez (blake2b; a hash() folyamatonként más)."""
+    return int.from_bytes(hashlib.blake2b(norm.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+def _fmix64(h: np.ndarray) -> np.ndarray:
+    # murmur3 finalizer: a polinomiális shingle-kód bitjeinek szétkeverése
+    h = h ^ (h >> np.uint64(33))
+    h = h * np.uint64(0xFF51AFD7ED558CCD)
+    h = h ^ (h >> np.uint64(33))
+    h = h * np.uint64(0xC4CEB9FE1A85EC53)
+    return h ^ (h >> np.uint64(33))
+
+class MinHasher:
+    """Vektorizált MinHash: multiply-shift hash család, uint32 aláírás."""
+
+    def __init__(self, num_perm: int = NUM_PERM, shingle: int = SHINGLE, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self.a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    def _shingles(self, norms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Az összes dokumentum shingle-hash-e egy tömbben + dokumentumonkénti kezdő offset."""
+        k = self.shingle
+        enc = [n.encode("utf-8").ljust(k) for n in norms]
+        lens = np.fromiter((len(e) for e in enc), dtype=np.int64, count=len(enc))
+        buf = np.frombuffer(b"".join(enc), dtype=np.uint8)
+        win = np.lib.stride_tricks.sliding_window_view(buf, k).astype(np.uint64)
+        code = win @ (np.uint64(257) ** np.arange(k - 1, -1, -1, dtype=np.uint64))
+        starts = np.concatenate([[0], np.cumsum(lens)[:-1]])
+        n_sh = lens - k + 1
+        # dokumentumhatárt átlépő ablakok kihagyása
+        idx = np.repeat(starts - np.concatenate([[0], np.cumsum(n_sh)[:-1]]), n_sh) + np.arange(n_sh.sum())
+        return _fmix64(code[idx]) >> np.uint64(32), np.concatenate([[0], np.cumsum(n_sh)[:-1]])
+
+    def signatures(self, norms: List[str]) -> np.ndarray:
+        """(n, num_perm) uint32 aláírás; chunkonként, hogy a (shingle × perm) mátrix korlátos maradjon."""
+        out = np.empty((len(norms), self.num_perm), dtype=np.uint32)
+        if not norms:
+            return out
+        h, offs = self._shingles(norms)
+        ends = np.append(offs[1:], len(h))
+        budget = max(1, CHUNK_ELEMS // self.num_perm)
+        i = 0
+        while i < len(norms):
+            j = i + 1
+            while j < len(norms) and ends[j] - offs[i] <= budget:
+                j += 1
+            blk = h[offs[i]:ends[j - 1], None] * self.a + self.b
+            out[i:j] = np.minimum.reduceat((blk >> np.uint64(32)).astype(np.uint32), offs[i:j] - offs[i], axis=0)
+            i = j
+        return out
+
+def lsh_pairs(sig: np.ndarray, bands: int = BANDS) -> np.ndarray:
+    """Jelölt párok (m, 2): sávonként azonos bucketbe eső aláírások (rendezés, nem n²)."""
+    n, p = sig.shape
+    r = p // bands
+    pairs = []
+    for b in range(bands):
+        keys = np.ascontiguousarray(sig[:, b * r:(b + 1) * r]).view(f"V{4 * r}").ravel()
+        _, inv = np.unique(keys, return_inverse=True)
+        order = np.argsort(inv, kind="stable")
+        g = inv[order]
+        first = np.flatnonzero(np.diff(g, prepend=-1))
+        head = order[first][np.cumsum(np.diff(g, prepend=-1) != 0) - 1]
+        m = head != order
+        if m.any():
+            pairs.append(np.stack([head[m], order[m]], axis=1))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.unique(np.concatenate(pairs), axis=0)
+
+def _band_hashes(sig: np.ndarray, bands: int) -> np.ndarray:
+    """(bands, n) uint64: sávonként a sáv értékeinek keverése egy kulcsba (ütközést a Jaccard-becslés szűr)."""
+    r = sig.shape[1] // bands
+    out = np.zeros((bands, len(sig)), dtype=np.uint64)
+    for b in range(bands):
+        for c in range(b * r, (b + 1) * r):
+            out[b] = _fmix64(out[b] ^ sig[:, c].astype(np.uint64))
+    return out
+
+def lsh_links(old: np.ndarray, new: np.ndarray, bands: int = BANDS) -> np.ndarray:
+    """Jelölt párok (m, 2) = (régi sor, új sor): sávonként azonos kulcs, a régiek egymás közti párjai nélkül."""
+    if not len(old) or not len(new):
+        return np.empty((0, 2), dtype=np.int64)
+    ko, kn = _band_hashes(old, bands), _band_hashes(new, bands)
+    pairs = []
+    for b in range(bands):
+        order = np.argsort(ko[b], kind="stable")
+        sk = ko[b][order]
+        lo = np.searchsorted(sk, kn[b], "left")
+        cnt = np.searchsorted(sk, kn[b], "right") - lo
+        if cnt.any():
+            offs = np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+            pairs.append(np.stack([order[np.repeat(lo, cnt) + offs], np.repeat(np.arange(len(new)), cnt)], axis=1))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.unique(np.concatenate(pairs), axis=0)
+
+def _find(parent: np.ndarray, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def cluster(sig: np.ndarray, threshold: float = THRESHOLD, bands: int = BANDS) -> np.ndarray:
+    """Komponens-gyökér soronként: LSH jelöltek, becsült Jaccard >= threshold, union-find."""
+    n = len(sig)
+    parent = np.arange(n)
+    pairs = lsh_pairs(sig, bands)
+    if len(pairs):
+        est = (sig[pairs[:, 0]] == sig[pairs[:, 1]]).mean(axis=1)
+        for i, j in pairs[est >= threshold]:
+            ri, rj = _find(parent, int(i)), _find(parent, int(j))
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+    return np.fromiter((_find(parent, i) for i in range(n)), dtype=np.int64, count=n)
+
+class DedupIndex:
+    """
+    Perzisztens aláírás-index: soronként (aláírás, szövegkulcs, cluster_id, első látás, score).
+    Új hírek: pontos egyezés a szövegkulcson, különben MinHash + LSH, inkrementálisan:
+    csak az új sorok élei (új-régi jelöltek és új-új párok) kerülnek union-findbe, a régi
+    sorok már meglévő clusterei egy-egy csomópontként. A régi aláírások sávkulcsai minden
+    hívásnál vektorizáltan (hash + rendezés) számolódnak, a soronkénti munka az új sorokra jut.
+    """
+
+    def __init__(self, path: pathlib.Path = INDEX_PATH, hasher: Optional[MinHasher] = None,
+                 threshold: float = THRESHOLD, bands: int = BANDS, max_age_hours: float = MAX_AGE_HOURS):
+        self.path = pathlib.Path(path)
+        self.hasher = hasher or MinHasher()
+        self.threshold = threshold
+        self.bands = bands
+        self.max_age_hours = max_age_hours
+        self.sig = np.empty((0, self.hasher.num_perm), dtype=np.uint32)
+        self.key = np.empty(0, dtype=np.int64)
+        self.cluster = np.empty(0, dtype=np.int64)
+        self.time = np.empty(0, dtype=np.int64)
+        self.score = np.empty(0, dtype=np.float32)
+        self.next_id = 0
+
+    @classmethod
+    def load(cls, path: pathlib.Path = INDEX_PATH, **kw) -> "DedupIndex":
+        idx = cls(path, **kw)
+        if idx.path.exists():
+            z = np.load(idx.path)
+            if z["sig"].shape[1] == idx.hasher.num_perm:
+                idx.sig, idx.key, idx.cluster = z["sig"], z["key"], z["cluster"]
+                idx.time, idx.score, idx.next_id = z["time"], z["score"], int(z["next_id"])
+            else:
+                logger.warning(f"{idx.path}: num_perm changed, rebuilding dedup index")
+        return idx
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp.npz")
+        np.savez(tmp, sig=self.sig, key=self.key, cluster=self.cluster, time=self.time,
+                 score=self.score, next_id=np.int64(self.next_id))
+        tmp.replace(self.path)
+
+    def prune(self, now: pd.Timestamp) -> None:
+        keep = self.time >= (now - pd.Timedelta(hours=self.max_age_hours)).value
+        for a in ("sig", "key", "cluster", "time", "score"):
+            setattr(self, a, getattr(self, a)[keep])
+
+    def assign(self, norms: List[str], times: np.ndarray) -> np.ndarray:
+        """
+        Cluster id minden (egyedi, normalizált) szövegre; az index bővül az új szövegekkel.
+        A régi sorok egymás közti párjait nem számoljuk újra (azok clusterei már összevontak).
+        """
+        keys = np.fromiter((text_key(n) for n in norms), dtype=np.int64, count=len(norms))
+        new = np.flatnonzero(~np.isin(keys, self.key))
+        if len(new):
+            sig_new = self.hasher.signatures([norms[i] for i in new])
+            links = lsh_links(self.sig, sig_new, self.bands)
+            links = links[(self.sig[links[:, 0]] == sig_new[links[:, 1]]).mean(axis=1) >= self.threshold]
+            # csomópontok: az érintett régi clusterek (rendezett id-k), utánuk az új sorok
+            touched = np.unique(self.cluster[links[:, 0]])
+            k = len(touched)
+            roots = cluster(sig_new, self.threshold, self.bands) + k
+            parent = np.concatenate([np.arange(k), roots])
+            for i, j in zip(np.searchsorted(touched, self.cluster[links[:, 0]]), links[:, 1] + k):
+                ri, rj = _find(parent, int(i)), _find(parent, int(j))
+                if ri != rj:
+                    parent[max(ri, rj)] = min(ri, rj)
+            roots = np.fromiter((_find(parent, i) for i in range(len(parent))), dtype=np.int64,
+                                count=len(parent))
+
+            # komponensenként: ha van régi tagja, a legkisebb régi id (a gyökér < k), különben friss id.
+            # Két régi cluster össze is olvadhat (egy új hír áthidalja) -> a régi sorok is átszámozva.
+            fresh = np.unique(roots[k:][roots[k:] >= k])
+            fresh_id = dict(zip(fresh.tolist(), range(self.next_id, self.next_id + len(fresh))))
+            self.next_id += len(fresh)
+            new_ids = np.fromiter((touched[r] if r < k else fresh_id[r] for r in roots[k:]),
+                                  dtype=np.int64, count=len(new))
+            if k:
+                merged = touched[roots[:k]]
+                pos = np.searchsorted(touched, self.cluster).clip(max=k - 1)
+                self.cluster = np.where(touched[pos] == self.cluster, merged[pos], self.cluster)
+
+            self.sig = np.vstack([self.sig, sig_new])
+            self.key = np.concatenate([self.key, keys[new]])
+            self.cluster = np.concatenate([self.cluster, new_ids])
+            self.time = np.concatenate([self.time, np.asarray(times, dtype="datetime64[ns]").astype(np.int64)[new]])
+            self.score = np.concatenate([self.score, np.full(len(new), np.nan, dtype=np.float32)])
+        by_key = pd.Series(self.cluster, index=self.key)
+        return by_key[~by_key.index.duplicated()].reindex(keys).to_numpy().astype(np.int64)
+
+    def scores(self) -> Dict[int, float]:
+        """cluster_id -> már kiszámolt score (NaN nélkül)."""
+        s = pd.Series(self.score, index=self.cluster).dropna()
+        return s[~s.index.duplicated()].to_dict()
+
+    def set_scores(self, scores: Dict[int, float]) -> None:
+        upd = pd.Series(self.cluster).map(scores).to_numpy(dtype=np.float32)
+        self.score = np.where(np.isnan(upd), self.score, upd).astype(np.float32)
+
+def dedup_news(df: pd.DataFrame, index: Optional[DedupIndex] = None) -> pd.DataFrame:
+    """
+    cluster_id oszlop minden sorhoz (title + text alapján). Azonos normalizált szöveg
+    csak egyszer kerül MinHash-be; index=None -> csak az aktuális snapshoton belül.
+    """
+    df = df.copy()
+    norm = (df["title"].fillna("").astype(str) + " " + df["text"].fillna("").astype(str)).map(normalize)
+    # üres szövegek nem duplikátumai egymásnak: egyedi negatív id
+    df["cluster_id"] = -1 - np.arange(len(df), dtype=np.int64)
+    ok = (norm != "").to_numpy()
+    if not ok.any():
+        return df
+    codes, uniq = pd.factorize(norm[ok])
+    t = pd.to_datetime(df.loc[ok, "time"], utc=True)
+    first_seen = t.groupby(codes).min().dt.tz_convert(None).to_numpy()
+    index = index or DedupIndex()
+    index.prune(t.max())
+    df.loc[ok, "cluster_id"] = index.assign(list(uniq), first_seen)[codes]
+    return df
+
+def collapse(df: pd.DataFrame, keys: Tuple[str, ...] = ("asset", "cluster_id")) -> pd.DataFrame:
+    """Clusterenként (és assetenként) egy sor: a legkorábbi példány + dup_cnt = másolatok száma."""
+    if df.empty:
+        return df.assign(dup_cnt=pd.Series(dtype="int64"))
+    df = df.sort_values("time", kind="stable")
+    g = df.groupby(list(keys), sort=False)
+    out = df.loc[g.head(1).index].copy()
+    out["dup_cnt"] = g["time"].transform("size").loc[out.index].astype("int64")
+    return out.reset_index(drop=True)
@@ -8,9 +8,12 @@ from dotenv import load_dotenv
 
 from src.news.sources import fetch_newsapi, fetch_twitter, fetch_rss
 from src.nlp.sentiment import score_many
+from src.news.dedup import DedupIndex, collapse, dedup_news
 
 RAW_NEWS_DIR = pathlib.Path("data/raw_news")
 RAW_NEWS_DIR.mkdir(parents=True, exist_ok=True)
+# üres (title + text nélküli) hír score-ja: a VADER compound is 0 lenne rá
+EMPTY_SCORE = 0.0
 
 load_dotenv()
 
@@ -122,10 +125,30 @@ def _collect_for_asset(asset: str, hours_newsapi=24, hours_twitter=12) -> pd.Dat
     df["time"] = pd.to_datetime(df["time"], utc=True, errors="coerce")
     df = df.dropna(subset=["time"]).sort_values("time")
     df["asset"] = asset
-    df["score"] = score_many(df["title"].fillna("").astype(str) + " " + df["text"].fillna("").astype(str))
     return df
 
-def run_news_snapshot(assets: List[str], hours_newsapi=24, hours_twitter=12) -> pathlib.Path | None:
+def _texts(df: pd.DataFrame) -> pd.Series:
+    return df["title"].fillna("").astype(str) + " " + df["text"].fillna("").astype(str)
+
+def _score_clusters(df: pd.DataFrame, index: DedupIndex) -> pd.DataFrame:
+    """
+    VADER clusterenként egyszer (az első példányon); a korábbi snapshotokból ismert score újrahasznosítva.
+    Üres szövegű sorok (negatív cluster_id): nincs mit pontozni -> semleges EMPTY_SCORE, VADER nélkül.
+    """
+    known = index.scores()
+    reps = df.drop_duplicates("cluster_id")
+    empty = reps["cluster_id"] < 0
+    neutral = dict.fromkeys(reps.loc[empty, "cluster_id"].astype(int), EMPTY_SCORE)
+    reps = reps[~empty & ~reps["cluster_id"].isin(list(known))]
+    new = dict(zip(reps["cluster_id"].astype(int), score_many(_texts(reps)))) if len(reps) else {}
+    index.set_scores(new)
+    df["score"] = df["cluster_id"].map({**known, **new, **neutral}).astype(float)
+    n = df["cluster_id"].nunique()
+    logger.info(f"News dedup: {n - len(neutral)} clusters from {len(df)} rows, "
+                f"{len(new)} scored, {n - len(new) - len(neutral)} reused, {len(neutral)} empty")
+    return df
+
+def run_news_snapshot(assets: List[str], hours_newsapi=24, hours_twitter=12, dedup: bool = True) -> pathlib.Path | None:
     all_df: List[pd.DataFrame] = []
 
     for a in assets:
@@ -147,6 +170,15 @@ def run_news_snapshot(assets: List[str], hours_newsapi=24, hours_twitter=12) ->
     df["time"] = pd.to_datetime(df["time"], utc=True, errors="coerce")
     df = df.dropna(subset=["time"])
 
+    if dedup:
+        # ugyanaz a sztori több forrásból/assethez: egy cluster, egy score, assetenként egy sor
+        index = DedupIndex.load()
+        df = _score_clusters(dedup_news(df, index), index)
+        df = collapse(df, ("asset", "cluster_id"))
+        index.save()
+    else:
+        df["score"] = score_many(_texts(df))
+
     ts = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M")
     out = RAW_NEWS_DIR / f"news_{ts}.parquet"
     df.to_parquet(out, index=False)
@@ -159,11 +191,13 @@ def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--hours", type=int, default=24)
     ap.add_argument("--thours", type=int, default=12)
+    ap.add_argument("--no_dedup", action="store_true", help="minden másolat megtartása (régi viselkedés)")
     args = ap.parse_args()
 
     with open("config.yaml","r",encoding="utf-8") as f:
         cfg = yaml.safe_load(f)
-    run_news_snapshot(cfg["assets"], hours_newsapi=args.hours, hours_twitter=args.thours)
+    run_news_snapshot(cfg["assets"], hours_newsapi=args.hours, hours_twitter=args.thours,
+                      dedup=not args.no_dedup)
 
 if __name__ == "__main__":
     main()
@@ -2,14 +2,22 @@
 from __future__ import annotations
 import os, json, subprocess as sp, sys
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
 import yaml
 from loguru import logger
 
+from src.backtest.results_db import DB_PATH, best_threshold, read_runs_json, restore_runs
+from src.features.raw_io import _guess_timeframes
+from src.models.registry import SHARED, artifact_path
+from src.models.train_parallel import MODELS as TRAINABLE
+from src.utils.stage_cache import Stage, StageCache, module_closure, output_state, rewrote_outputs
+
 PY = sys.executable
 # Ez a file: <project>/src/run/pipeline.py → a projekt gyökér: parents[2]
 PROJECT = Path(__file__).resolve().parents[2]
 SRC = PROJECT / "src"
+# tune/backtest futás-JSON-ok (a stage-cache kimenetei -> hitnél visszaállíthatók)
+RUNS_DIR = PROJECT / "reports" / "runs"
 
 def sh(args: List[str]) -> str:
     """Run a child process with PYTHONPATH=src, cwd=project root."""
@@ -37,6 +45,8 @@ def load_cfg() -> dict:
     cfg.setdefault("th_to", 0.70)
     cfg.setdefault("th_step", 0.01)
     cfg.setdefault("news_window_hours", 24)
+    cfg.setdefault("n_boot", 1000)
+    cfg.setdefault("train_holdout", 0.3)
     # A te config-odban 'timeframes' kulcs van — ezt használjuk
     if "timeframes" not in cfg:
         cfg["timeframes"] = ["1d"]
@@ -44,51 +54,194 @@ def load_cfg() -> dict:
         cfg["assets"] = ["GC=F"]
     return cfg
 
+def _parse_best_th(out: str, default: Optional[float]) -> Optional[float]:
+    # utolsó JSON sort olvassuk ({"best_th": ...})
+    for ln in reversed(out.splitlines()):
+        if "best_th" in ln and "{" in ln:
+            try:
+                return float(json.loads(ln.replace("'", "\""))["best_th"])
+            except Exception:
+                pass
+    return default
+
+def _restore(status: str, runs_json: Path) -> None:
+    """Cache-hitnél a futás nem fut le -> a rögzített sorokat a visszaállított JSON-ból írjuk a DB-be."""
+    if status == "hit" and runs_json.exists():
+        n = restore_runs(read_runs_json(runs_json)["rows"], path=PROJECT / DB_PATH)
+        if n:
+            logger.info(f"Restored {n} result rows from {runs_json.name}")
+
+def _code(*mods: str) -> List[Path]:
+    """A stage belépő moduljai + minden tranzitívan importált src modul (kódverzió)."""
+    return module_closure([SRC / m for m in mods], SRC)
+
 def main():
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dry-run", action="store_true",
+                    help="csak kiírja, mely stage-ek futnának újra (cache miss)")
+    ap.add_argument("--no-cache", action="store_true")
+    args = ap.parse_args()
+
     cfg = load_cfg()
+    cache = StageCache(PROJECT / ".cache" / "stages",
+                       max_bytes=int(float(cfg.get("cache_max_gb", 2.0)) * 1024**3),
+                       max_age_days=float(cfg.get("cache_max_age_days", 30)))
+    plan: List[str] = []
+
+    def run(stage: Stage, args_: List[str], upstream_dirty: bool = False) -> Tuple[str, str]:
+        """Cache-elt sh(): (status, stdout). Dry-runban a miss lefelé is miss."""
+        if args.no_cache:
+            status, out = ("would-run (no-cache)", "") if args.dry_run else ("miss (no-cache)", sh(args_))
+        elif args.dry_run and upstream_dirty:
+            status, out = "would-run (upstream)", ""
+        else:
+            status, out = cache.run(stage, lambda: sh(args_), dry_run=args.dry_run)
+        plan.append(f"{status:22s} {stage.name}")
+        return status, out
+
+    feat = lambda a, t: PROJECT / "data" / "features" / f"{a}_{t}.parquet"
+    # asset×tf párok a feature-build szabályával (kripto: minden tf, a többi csak 1d),
+    # és csak amelyikhez van feature-fájl -> a tanítás/tuning nem fut hiányzó bemenetre
+    pairs = [(a, t) for a in cfg["assets"] for t in _guess_timeframes(a, cfg["timeframes"])]
+    missing = [f"{a} {t}" for a, t in pairs if not feat(a, t).exists()]
+    if missing:
+        logger.warning(f"No feature file, skipping: {', '.join(missing)}")
+    pairs = [(a, t) for a, t in pairs if feat(a, t).exists()]
 
     # 1) Hírek/feature merge (ha van modulod hozzá)
     # Ha nincs ilyen modul, ezt a blokkot kommenteld ki.
+    news = sorted((PROJECT / "data" / "raw_news").glob("news_*.parquet"))
+    feats = [feat(a, t) for a, t in pairs]
+    merge_dirty = False
     try:
-        sh([PY, "-m", "features.merge_news", "--window", str(cfg["news_window_hours"])])
+        status, _ = run(Stage("merge_news",
+                              inputs=news[-1:] + feats,
+                              config={"news_window_hours": cfg["news_window_hours"]},
+                              code=_code("features/merge_news.py"),
+                              outputs=feats, idempotent=True, snapshot=False),
+                        [PY, "-m", "features.merge_news", "--window", str(cfg["news_window_hours"])])
+        merge_dirty = status != "hit"
     except SystemExit:
         logger.warning("features.merge_news nem futott le — folytatom a tréninggel.")
 
-    # 2) Train → Tune → Backtest minden asset×tf kombinációra
-    for asset in cfg["assets"]:
-        for tf in cfg["timeframes"]:
-            # 2/a Tanítás + jelgenerálás (models/__main__.py végzi)
-            sh([PY, "-m", "models.baseline",
-                "--asset", asset, "--tf", tf,
-                "--model", cfg["model"], "--variant", cfg["variant"]])
-
-            # 2/b Küszöb-tuning
-            out = sh([PY, "-m", "backtest.tune_threshold",
-                      "--asset", asset, "--tf", tf, "--model", cfg["model"],
-                      "--hold", str(cfg["hold"]), "--fee_bps", str(cfg["fee_bps"]),
-                      "--th_from", str(cfg["th_from"]),
-                      "--th_to", str(cfg["th_to"]),
-                      "--th_step", str(cfg["th_step"])])
-
-            # utolsó JSON sort olvassuk ({"best_th": ...})
+    # 2) Tanítás: a cache-miss párok EGY párhuzamos futásban (shared memory, worker pool).
+    # train_shared: timeframe-enként egy közös modell (ALL_{tf}_...) az összes pár során.
+    model_cfg = {k: cfg[k] for k in ("model", "variant")}
+    shared = bool(cfg.get("train_shared", False))
+    owner_of = lambda a, t: (SHARED, t) if shared else (a, t)
+    members = {}
+    for a, t in pairs:
+        members.setdefault(owner_of(a, t), []).append((a, t))
+    train_cfg = {**model_cfg, "holdout": cfg["train_holdout"]}
+    stages = {o: Stage(f"train {o[0]} {o[1]}", inputs=[feat(a, t) for a, t in ms], config=train_cfg,
+                       code=_code("models/train_parallel.py"),
+                       outputs=[PROJECT / artifact_path(o[0], o[1], cfg["model"], cfg["variant"])])
+              for o, ms in members.items()}
+    owner_by_name = {st.name: o for o, st in stages.items()}
+    workers = ["--workers", str(cfg["train_workers"])] if cfg.get("train_workers") else []
+
+    def train(todo: List[Stage]) -> str:
+        # részleges hiba (nem nulla exit): a sikeres párok artefaktjai így is cache-elődnek
+        try:
+            return sh([PY, "-m", "models.train_parallel",
+                       "--model", cfg["model"], "--variant", cfg["variant"], *workers,
+                       *(["--shared"] if shared else []), "--holdout", str(cfg["train_holdout"]),
+                       "--pairs", *[f"{a}:{t}" for st in todo
+                                    for a, t in members[owner_by_name[st.name]]]])
+        except SystemExit as e:
+            logger.error(f"models.train_parallel exited with {e.code}; untrained pairs are skipped")
+            return ""
+
+    if cfg["model"] not in TRAINABLE:
+        # a train_parallel csak ezeket ismeri; más modell (pl. corrnet) meglévő artefaktjaival
+        # megy tovább a tuning/backtest (hiányzó artefakt -> a pár failed)
+        logger.warning(f"model={cfg['model']} is not trained by the pipeline "
+                       f"(trainable: {', '.join(TRAINABLE)}) — using existing artifacts")
+        statuses = ["skipped"] * len(stages)
+    elif args.no_cache:
+        statuses = ["would-run (no-cache)" if args.dry_run else "miss (no-cache)"] * len(stages)
+        if not args.dry_run:
+            before = {o: output_state(st) for o, st in stages.items()}
+            train(list(stages.values()))
+            statuses = [s if rewrote_outputs(stages[o], before[o]) else "failed"
+                        for o, s in zip(stages, statuses)]
+    elif args.dry_run and merge_dirty:
+        statuses = ["would-run (upstream)"] * len(stages)
+    else:
+        statuses = cache.run_many(list(stages.values()), train, dry_run=args.dry_run)
+    train_status = dict(zip(stages, statuses))
+    plan += [f"{st:22s} {stages[p].name}" for p, st in train_status.items()]
+
+    # 3) Tune → Backtest minden asset×tf kombinációra
+    tune_cfg = {**model_cfg, "shared": shared,
+                **{k: cfg[k] for k in ("hold", "fee_bps", "th_from", "th_to", "th_step")}}
+    shared_arg = ["--shared"] if shared else []
+    failed = [stages[o].name for o, st in train_status.items() if st == "failed"]
+    for asset, tf in pairs:
+        if train_status.get(owner_of(asset, tf)) == "failed":
+            logger.warning(f"[{asset} {tf}] training failed — tune/backtest skipped")
+            continue
+        f = feat(asset, tf)
+        # a registry feloldásával egyezően pontosan egy artefakt (train_shared: a közös modell)
+        art = PROJECT / artifact_path(*owner_of(asset, tf), cfg["model"], cfg["variant"])
+        tag = f"{asset} {tf}"
+        if not art.exists() and not args.dry_run:
+            logger.error(f"[{tag}] missing model artifact {art} — tune/backtest skipped")
+            failed.append(f"model {tag}")
+            continue
+        dirty = merge_dirty or train_status[owner_of(asset, tf)] not in ("hit", "skipped")
+        runs_json = lambda kind: RUNS_DIR / f"{kind}_{asset}_{tf}_{cfg['model']}_{cfg['variant']}.json"
+
+        # 3/a Küszöb-tuning
+        tune_out = runs_json("tune")
+        status, out = run(Stage(f"tune {tag}", inputs=[f, art], config={**tune_cfg, "n_boot": cfg["n_boot"]},
+                                code=_code("backtest/tune_threshold.py"), outputs=[tune_out]),
+                          [PY, "-m", "backtest.tune_threshold",
+                           "--asset", asset, "--tf", tf, "--model", cfg["model"],
+                           "--variant", cfg["variant"], *shared_arg, "--out", str(tune_out),
+                           "--hold", str(cfg["hold"]), "--fee_bps", str(cfg["fee_bps"]),
+                           "--th_from", str(cfg["th_from"]),
+                           "--th_to", str(cfg["th_to"]),
+                           "--th_step", str(cfg["th_step"]),
+                           "--n_boot", str(cfg["n_boot"])],
+                          upstream_dirty=dirty)
+        if not args.dry_run:
+            _restore(status, tune_out)
+        dirty = dirty or status != "hit"
+
+        best_th = _parse_best_th(out, None)
+        if best_th is None:
+            # nem olvasható stdout (pl. hibás tuner-kimenet): a results DB legutóbbi tuning futása
+            best_th = best_threshold(asset, tf, cfg["model"], cfg["variant"], last_n=1,
+                                     path=PROJECT / DB_PATH)
+        if best_th is None:
             best_th = cfg.get("th_default", 0.60)
-            for ln in reversed(out.splitlines()):
-                if "best_th" in ln and "{" in ln:
-                    try:
-                        best_th = float(json.loads(ln.replace("'", "\""))["best_th"])
-                        break
-                    except Exception:
-                        pass
-            logger.info(f"[{asset} {tf}] best_th = {best_th:.3f}")
-
-            # 2/c Backtest a legjobb küszöbbel
-            sh([PY, "-m", "backtest.simple_bt",
-                "--asset", asset, "--tf", tf, "--model", cfg["model"],
-                "--th", str(best_th), "--hold", str(cfg["hold"]),
-                "--fee_bps", str(cfg["fee_bps"])])
+        logger.info(f"[{asset} {tf}] best_th = {best_th:.3f}")
+
+        # 3/b Backtest a legjobb küszöbbel
+        bt_out = runs_json("backtest")
+        status, _ = run(Stage(f"backtest {tag}", inputs=[f, art], config={**tune_cfg, "th": best_th},
+                              code=_code("backtest/simple_bt.py"), outputs=[bt_out]),
+                        [PY, "-m", "backtest.simple_bt",
+                         "--asset", asset, "--tf", tf, "--model", cfg["model"],
+                         "--variant", cfg["variant"], *shared_arg, "--out", str(bt_out),
+                         "--th", str(best_th), "--hold", str(cfg["hold"]),
+                         "--fee_bps", str(cfg["fee_bps"])],
+                        upstream_dirty=dirty)
+        if not args.dry_run:
+            _restore(status, bt_out)
 
+    if args.dry_run:
+        if args.no_cache:
+            plan.insert(0, "cache bypassed (--no-cache): every stage runs")
+        print("\n".join(plan))
+        return
+    cache.evict()
+    if failed:
+        logger.error(f"Pipeline finished with failed stages: {', '.join(failed)}")
+        raise SystemExit(1)
     logger.info("Pipeline OK ✅")
 
 if __name__ == "__main__":
     main()
-
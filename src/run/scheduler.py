@@ -0,0 +1,244 @@
+# src/run/scheduler.py — hosszan futó APScheduler szolgáltatás meleg memóriaállapottal
+# A pipeline.py hideg CLI-futásai helyett egy folyamat tartja bent a configot,
+# a modelleket (registry), a VADER analizátort és a feature-állapotot, és
+# bar-záráshoz igazított ütemezéssel frissít: hírek -> feature-ök -> jelek.
+# A feature-ök és a korreláció inkrementálisan lépnek: assetenként egy warmup-nyi
+# nyers tail + OBV horgony, timeframe-enként egy élő korrelációs engine; a raw
+# fájlokból csak az új sorokat olvassuk.
+from __future__ import annotations
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from loguru import logger
+
+from src.backtest.results_db import best_threshold
+from src.run.pipeline import load_cfg
+from src.features import build_dataset as bd
+from src.features.labels import LabelSpec
+from src.features.corr_engine import LiveCorr, merge_corr
+from src.features.merge_news import _agg_news, _list_latest_news, merge_asset_news
+from src.features.variants import FEATURE_ROW_GROUP
+from src.models.registry import REGISTRY, fingerprint
+from src.news.pipeline import run_news_snapshot
+from src.signals.generate import generate_signals_batch, save_signals_many
+
+def bar_close_trigger(tf: str, delay_sec: int = 30) -> CronTrigger:
+    """Cron a bar-zárásokra (UTC), `delay_sec` késleltetéssel, hogy a raw adat beérjen."""
+    unit, n = tf[-1], int(tf[:-1])
+    if unit == "m":
+        return CronTrigger(minute=f"*/{n}", second=delay_sec, timezone=timezone.utc)
+    if unit == "h":
+        return CronTrigger(hour=f"*/{n}", minute=0, second=delay_sec, timezone=timezone.utc)
+    if unit == "d":
+        return CronTrigger(hour=0, minute=0, second=delay_sec, timezone=timezone.utc)
+    raise ValueError(f"Unsupported timeframe for scheduling: {tf}")
+
+class WarmState:
+    """A jobok között megőrzött állapot; a feature-fájl írásokat egy zár védi."""
+
+    def __init__(self):
+        self.cfg = load_cfg()
+        self.labels = LabelSpec.from_cfg(self.cfg.get("labels"))
+        self.registry = REGISTRY
+        self.news_agg = pd.DataFrame()
+        self.news_path = None
+        self.raw_fp: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        # (asset, tf) -> meleg indikátor-állapot; tf -> élő korreláció (ha van corr_window)
+        self.features: Dict[Tuple[str, str], bd.LiveFeatures] = {}
+        self.corr: Dict[str, LiveCorr] = {}
+        self.primed: set = set()
+        self.write_lock = threading.Lock()
+        # a VADER lexikon betöltése induláskor, nem az első hírjobnál
+        import src.nlp.sentiment  # noqa: F401
+
+    def pairs(self, tf: str) -> List[Tuple[str, str]]:
+        tfs = self.cfg["timeframes"]
+        return [(a, tf) for a in self.cfg["assets"] if tf in bd._guess_timeframes(a, tfs)]
+
+    def refresh_news_agg(self) -> None:
+        p = _list_latest_news()
+        if p is None or p == self.news_path:
+            return
+        news = pd.read_parquet(p)
+        self.news_agg = _agg_news(news, window_hours=int(self.cfg["news_window_hours"]))
+        self.news_path = p
+
+def news_job(state: WarmState) -> None:
+    t0 = time.perf_counter()
+    run_news_snapshot(state.cfg["assets"])
+    state.refresh_news_agg()
+    if state.news_agg.empty:
+        return
+    # a meglévő feature-fájlokba azonnal bemerge-eljük (a modellek a következő jelnél látják)
+    with state.write_lock:
+        for tf in state.cfg["timeframes"]:
+            for asset, _ in state.pairs(tf):
+                p = bd.OUT_DIR / f"{asset}_{tf}.parquet"
+                if not p.exists():
+                    continue
+                feat = merge_asset_news(pd.read_parquet(p), state.news_agg, asset)
+                feat.to_parquet(p, index=False, row_group_size=FEATURE_ROW_GROUP)
+    logger.info(f"news_job done in {time.perf_counter() - t0:.1f}s")
+
+def _write_features(state: WarmState, asset: str, tf: str, rows: pd.DataFrame,
+                    corr: Optional[pd.DataFrame], splice: bool) -> bool:
+    """
+    corr + hír merge, majd írás. splice: a fájl `rows` első időpontjától kezdődő
+    része cserélődik (a korábbi sorok változatlanok), különben teljes felülírás.
+    """
+    if corr is not None and not corr.empty:
+        rows = merge_corr(rows, corr, asset, tf)
+    if rows.empty:
+        return False
+    rows = merge_asset_news(rows, state.news_agg, asset)
+    p = bd.OUT_DIR / f"{asset}_{tf}.parquet"
+    if splice and p.exists():
+        old = pd.read_parquet(p, filters=[("time", "<", rows["time"].iat[0])])
+        rows = pd.concat([old, rows], ignore_index=True)
+    rows.to_parquet(p, index=False, row_group_size=FEATURE_ROW_GROUP)
+    return True
+
+def _prime_tf(state: WarmState, tf: str) -> List[Tuple[str, str]]:
+    """Hidegindítás: teljes build a tf összes assetjére, a meleg állapot felvételével."""
+    pairs = state.pairs(tf)
+    corr = None
+    window = state.cfg.get("corr_window")
+    if window:
+        lc = LiveCorr(tf, int(window), stale=int(state.cfg.get("corr_stale_bars", 5)))
+        corr = lc.prime(bd.load_closes([a for a, _ in pairs], tf))
+        state.corr[tf] = lc
+    done = []
+    for asset, _ in pairs:
+        lf = bd.LiveFeatures(asset, tf, labels=state.labels)
+        state.features[(asset, tf)] = lf
+        feat = lf.prime()
+        if not feat.empty and _write_features(state, asset, tf, feat, corr, splice=False):
+            done.append((asset, tf))
+    state.primed.add(tf)
+    return done
+
+def _step_tf(state: WarmState, tf: str, changed: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Meleg lépés: a megváltozott raw fájlokból csak a last_time utáni sorok; a korreláció
+    a véglegesült barokkal lép. Ha a corr horizontja előrelépett, a horizont utáni
+    (addig előzetes corr-ral írt) sorokat minden assetnél újra kiadjuk.
+    """
+    lc = state.corr.get(tf)
+    new = {}
+    for asset, _ in changed:
+        lf = state.features.get((asset, tf))
+        # a hidegindításkor még üres/rövid raw-ú asset most jelent meg -> a korreláció
+        # assetkészlete is változik, ezért a tf teljes újraindítása
+        if lf is None or lf.last_time is None or (lc is not None and asset not in lc.assets):
+            return _prime_tf(state, tf)
+        new[asset] = bd.read_raw_since(asset, tf, lf.last_time)
+
+    since = None
+    if lc is not None:
+        before = lc.horizon
+        lc.step({a: df[["time", "close"]] for a, df in new.items() if not df.empty})
+        if lc.horizon != before:
+            since = before
+    corr = lc.frame if lc is not None else None
+
+    done = []
+    for asset, _ in state.pairs(tf):
+        lf = state.features.get((asset, tf))
+        if lf is None or lf.last_time is None or (asset not in new and since is None):
+            continue
+        rows = lf.step(new.get(asset), since=since)
+        if not rows.empty and _write_features(state, asset, tf, rows, corr, splice=True):
+            done.append((asset, tf))
+    return done
+
+def _thresholds(state: WarmState, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+    """Páronként a legutóbbi tuning legjobb küszöbe (mint a pipeline backtestje); ha nincs, th_default."""
+    cfg = state.cfg
+    default = float(cfg.get("th_default", 0.60))
+    out = {}
+    for asset, tf in pairs:
+        th = best_threshold(asset, tf, cfg["model"], cfg["variant"], last_n=1)
+        out[(asset, tf)] = default if th is None else th
+    return out
+
+def bar_job(state: WarmState, tf: str) -> None:
+    """
+    Bar-zárás után: a megváltozott raw fájlú assetekre inkrementális feature- és
+    korreláció-lépés (első futáskor hidegindítás), majd egy batch-ben jelet generálunk.
+    """
+    t0 = time.perf_counter()
+    cfg = state.cfg
+    state.refresh_news_agg()
+
+    changed: Dict[Tuple[str, str], Tuple[int, int]] = {}
+    for asset, _ in state.pairs(tf):
+        fp = fingerprint(bd.RAW_DIR / f"{asset}_{tf}.parquet")
+        if fp is not None and state.raw_fp.get((asset, tf)) != fp:
+            changed[(asset, tf)] = fp
+    if not changed:
+        logger.info(f"bar_job {tf}: no new raw data")
+        return
+
+    with state.write_lock:
+        if tf not in state.primed:
+            done = _prime_tf(state, tf)
+        else:
+            done = _step_tf(state, tf, list(changed))
+    state.raw_fp.update(changed)
+    if not done:
+        return
+
+    sigs = generate_signals_batch(done, cfg["model"], float(cfg.get("th_default", 0.60)),
+                                  float(cfg["hold"]), cfg["variant"],
+                                  shared=bool(cfg.get("train_shared", False)),
+                                  thresholds=_thresholds(state, done))
+    save_signals_many(sigs, cfg["model"], append=True)
+
+    last_bar = max((s["time"].iloc[-1] for s in sigs.values() if len(s)), default=None)
+    lag = ""
+    if last_bar is not None:
+        lag = f", last bar {last_bar} -> {(datetime.now(timezone.utc) - last_bar).total_seconds():.0f}s ago"
+    logger.info(f"bar_job {tf}: {len(done)} series refreshed in {time.perf_counter() - t0:.1f}s{lag}")
+
+def build_scheduler(state: WarmState, scheduler: Optional[BlockingScheduler] = None) -> BlockingScheduler:
+    """
+    Jobok: hírek fix intervallummal, timeframe-enként bar-zárás cron.
+    coalesce + max_instances=1: lemaradt futások összevonva, nincs átfedés.
+    """
+    cfg = state.cfg
+    sched = scheduler or BlockingScheduler(timezone=timezone.utc)
+    opts = dict(coalesce=True, max_instances=1, misfire_grace_time=int(cfg.get("sched_misfire_sec", 300)))
+    sched.add_job(news_job, IntervalTrigger(minutes=int(cfg.get("news_interval_min", 60))),
+                  args=[state], id="news", **opts)
+    delay = int(cfg.get("sched_delay_sec", 30))
+    for tf in cfg["timeframes"]:
+        sched.add_job(bar_job, bar_close_trigger(tf, delay), args=[state, tf], id=f"bars_{tf}", **opts)
+    return sched
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--once", action="store_true", help="minden job egyszer, azonnal (ütemezés nélkül)")
+    args = ap.parse_args()
+
+    state = WarmState()
+    if args.once:
+        news_job(state)
+        for tf in state.cfg["timeframes"]:
+            bar_job(state, tf)
+        return
+
+    sched = build_scheduler(state)
+    logger.info(f"Scheduler start: jobs={[j.id for j in sched.get_jobs()]}")
+    try:
+        sched.start()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Scheduler stopped")
+
+if __name__ == "__main__":
+    main()
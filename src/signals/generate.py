@@ -1,9 +1,11 @@
 # src/signals/generate.py
 from __future__ import annotations
 import pathlib
+from typing import Dict, Iterable, List, Optional, Tuple
 import pandas as pd
 from loguru import logger
-from src.models.baseline import predict_proba
+from src.models.registry import predict_proba, predict_proba_many
+from src.signals import store
 
 REPORTS_DIR = pathlib.Path("reports")
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
@@ -14,6 +16,8 @@ def generate_signals(
     model_type: str = "logreg",
     prob_threshold: float = 0.6,
     hold: float = 0.4,
+    variant: str = "base_news",
+    shared: bool = False,
 ) -> pd.DataFrame:
     """
     Egyszerű, backtest-kompatibilis jelgenerálás:
@@ -21,8 +25,19 @@ def generate_signals(
       - SELL, ha p_buy <= 1-th -> -1
       - különben HOLD -> 0
     A 'hold' opcionálisan enyhe kisimításra szolgál (rolling átlag).
+    A valószínűségek a model registry-ből jönnek (cache-elt modell + memo),
+    így ismételt hívás más küszöbbel már csak tömbművelet.
+    shared: a timeframe közös modellje (config: train_shared).
     """
-    probs = predict_proba(asset, tf, model_type)  # tartalmazza a 'time' oszlopot
+    probs = predict_proba(asset, tf, model_type, variant, shared)  # tartalmazza a 'time' oszlopot
+    out = _signals_from_probs(probs, prob_threshold, hold)
+    logger.info(
+        f"Signals generated for {asset} {tf} (th={prob_threshold}, hold={hold}) | "
+        f"non-flat bars={(out['signal'] != 0).sum()}"
+    )
+    return out
+
+def _signals_from_probs(probs: pd.DataFrame, prob_threshold: float, hold: float) -> pd.DataFrame:
     p = probs["p_buy"].astype(float)
 
     # Nyers jelek (−1 / 0 / +1)
@@ -38,29 +53,83 @@ def generate_signals(
     out = probs[["time"]].copy()
     out["signal"] = sig.astype(float)  # numeric kell a backtestnek
     out["confidence"] = (p - 0.5).abs() * 2.0  # 0..1 skála, opcionális
+    return out
+
+def generate_signals_batch(
+    pairs: Iterable[Tuple[str, str]],
+    model_type: str = "logreg",
+    prob_threshold: float = 0.6,
+    hold: float = 0.4,
+    variant: str = "base_news",
+    shared: bool = False,
+    thresholds: Optional[Dict[Tuple[str, str], float]] = None,
+) -> Dict[Tuple[str, str], pd.DataFrame]:
+    """
+    Több asset×tf egyszerre: a registry modellenként egyetlen vektorizált
+    predict_proba-t futtat az egymásra rakott feature-mátrixokon, a jelszabály
+    ugyanaz, mint a generate_signals-ban.
+    thresholds: páronkénti küszöb (pl. tuning rekordból); ami hiányzik, prob_threshold.
+    """
+    probs = predict_proba_many(list(pairs), model_type, variant, skip_missing=True, shared=shared)
+    ths = thresholds or {}
+    out = {k: _signals_from_probs(v, ths.get(k, prob_threshold), hold) for k, v in probs.items()}
+    non_flat = sum(int((v["signal"] != 0).sum()) for v in out.values())
     logger.info(
-        f"Signals generated for {asset} {tf} (th={prob_threshold}, hold={hold}) | "
-        f"non-flat bars={(sig != 0).sum()}"
+        f"Signals generated (batch) for {len(out)} series, model={model_type} "
+        f"(th={prob_threshold}, hold={hold}) | non-flat bars={non_flat}"
     )
     return out
 
-def save_signals(df: pd.DataFrame, asset: str, tf: str, model: str):
-    path = REPORTS_DIR / f"signals_{asset}_{tf}_{model}.csv"
-    df.to_csv(path, index=False)
-    logger.info(f"Saved signals -> {path}")
+def save_signals(df: pd.DataFrame, asset: str, tf: str, model: str,
+                 append: bool = False, csv: bool = False):
+    """Jel-tárba írás (parquet, int8/float32); CSV csak opcionális export."""
+    n = store.write_signals(df, asset, tf, model, append=append)
+    logger.info(f"Saved signals -> {store.SIGNALS_DIR} ({asset} {tf} {model}, {n} rows)")
+    if csv:
+        path = REPORTS_DIR / f"signals_{asset}_{tf}_{model}.csv"
+        df.to_csv(path, index=False)
+        logger.info(f"Exported signals CSV -> {path}")
+
+def save_signals_many(signals: Dict[Tuple[str, str], pd.DataFrame], model: str,
+                      append: bool = False, csv: bool = False) -> None:
+    store.write_signals_many(signals, model, append=append)
+    if csv:
+        for (asset, tf), df in signals.items():
+            df.to_csv(REPORTS_DIR / f"signals_{asset}_{tf}_{model}.csv", index=False)
+        logger.info(f"Exported signals CSV for {len(signals)} series -> {REPORTS_DIR}")
+
+def _configured_pairs(cfg_path: str = "config.yaml") -> List[Tuple[str, str]]:
+    from src.features.raw_io import load_config, _guess_timeframes
+    cfg = load_config(cfg_path)
+    tfs = cfg.get("timeframes", ["4h", "1d"])
+    return [(a, tf) for a in cfg["assets"] for tf in _guess_timeframes(a, tfs)]
 
 def main():
     import argparse
     ap = argparse.ArgumentParser()
-    ap.add_argument("--asset", required=True)
-    ap.add_argument("--tf", required=True)
+    ap.add_argument("--asset")
+    ap.add_argument("--tf")
+    ap.add_argument("--all", action="store_true",
+                    help="minden konfigurált asset×tf egy batch-ben")
     ap.add_argument("--model", choices=["logreg","rf"], default="logreg")
     ap.add_argument("--th", type=float, default=0.6)
     ap.add_argument("--hold", type=float, default=0.4)
+    ap.add_argument("--variant", default="base_news")
+    ap.add_argument("--shared", action="store_true",
+                    help="a közös ALL_{tf} modell (config: train_shared)")
+    ap.add_argument("--append", action="store_true", help="csak az új barok hozzáírása a jel-tárhoz")
+    ap.add_argument("--csv", action="store_true", help="CSV export a reports/ alá is")
     args = ap.parse_args()
 
-    df = generate_signals(args.asset, args.tf, args.model, args.th, args.hold)
-    save_signals(df, args.asset, args.tf, args.model)
+    if args.all:
+        sigs = generate_signals_batch(_configured_pairs(), args.model, args.th, args.hold, args.variant,
+                                      args.shared)
+        save_signals_many(sigs, args.model, append=args.append, csv=args.csv)
+        return
+    if not args.asset or not args.tf:
+        ap.error("--asset and --tf are required unless --all is given")
+    df = generate_signals(args.asset, args.tf, args.model, args.th, args.hold, args.variant, args.shared)
+    save_signals(df, args.asset, args.tf, args.model, append=args.append, csv=args.csv)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,130 @@
+# src/signals/store.py
+# Bináris oszlopos jel-tár a reports/signals_*.csv helyett.
+# Elrendezés: data/signals/{asset}/{tf}/{model}/part-NNNNNN.parquet
+# Típusok: time (UTC), signal int8, confidence float32. Inkrementális futásnál
+# új part-fájl kerül mellé (append), olvasáskor időszűrés a parquet olvasóban.
+from __future__ import annotations
+import pathlib
+import shutil
+from typing import Dict, Optional, Tuple
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from loguru import logger
+
+SIGNALS_DIR = pathlib.Path("data/signals")
+REPORTS_DIR = pathlib.Path("reports")
+
+SCHEMA = pa.schema([
+    ("time", pa.timestamp("us", tz="UTC")),
+    ("signal", pa.int8()),
+    ("confidence", pa.float32()),
+])
+
+def _dir(asset: str, tf: str, model: str) -> pathlib.Path:
+    return SIGNALS_DIR / asset / tf / model
+
+def _parts(d: pathlib.Path):
+    return sorted(d.glob("part-*.parquet"))
+
+def _to_table(df: pd.DataFrame) -> pa.Table:
+    t = pd.to_datetime(df["time"], utc=True)
+    conf = df["confidence"] if "confidence" in df.columns else pd.Series(0.0, index=df.index)
+    return pa.Table.from_pandas(pd.DataFrame({
+        "time": t,
+        "signal": df["signal"].round().clip(-1, 1).astype("int8"),
+        "confidence": conf.astype("float32"),
+    }), schema=SCHEMA, preserve_index=False)
+
+def _write_part(d: pathlib.Path, table: pa.Table) -> pathlib.Path:
+    d.mkdir(parents=True, exist_ok=True)
+    parts = _parts(d)
+    n = int(parts[-1].stem.split("-")[1]) + 1 if parts else 0
+    out = d / f"part-{n:06d}.parquet"
+    tmp = out.with_suffix(".tmp")
+    pq.write_table(table, tmp)
+    tmp.replace(out)
+    return out
+
+def last_time(asset: str, tf: str, model: str) -> Optional[pd.Timestamp]:
+    """A tárolt legutolsó időbélyeg (a part-fájlok statisztikáiból, adat olvasás nélkül)."""
+    best = None
+    for p in _parts(_dir(asset, tf, model)):
+        md = pq.ParquetFile(p).metadata
+        for i in range(md.num_row_groups):
+            st = md.row_group(i).column(0).statistics
+            if st is not None and st.has_min_max:
+                mx = pd.Timestamp(st.max)
+                mx = mx.tz_localize("UTC") if mx.tzinfo is None else mx
+                best = mx if best is None or mx > best else best
+    return best
+
+def write_signals(df: pd.DataFrame, asset: str, tf: str, model: str, append: bool = False) -> int:
+    """
+    append=False: a sorozat felülírása; append=True: csak az utolsó tárolt időnél
+    későbbi sorok kerülnek új part-fájlba. Visszaad: kiírt sorok száma.
+    """
+    d = _dir(asset, tf, model)
+    if append:
+        last = last_time(asset, tf, model)
+        if last is not None:
+            df = df[pd.to_datetime(df["time"], utc=True) > last]
+        if df.empty:
+            return 0
+    elif d.exists():
+        shutil.rmtree(d)
+    _write_part(d, _to_table(df))
+    return len(df)
+
+def write_signals_many(signals: Dict[Tuple[str, str], pd.DataFrame], model: str, append: bool = False) -> int:
+    n = 0
+    for (asset, tf), df in signals.items():
+        n += write_signals(df, asset, tf, model, append=append)
+    logger.info(f"Signal store: wrote {n:,} rows for {len(signals)} series ({model}) -> {SIGNALS_DIR}")
+    return n
+
+def _utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+def read_signals(asset: str, tf: str, model: str, start=None, end=None) -> pd.DataFrame:
+    """time, signal (int8), confidence (float32); opcionális [start, end) időablak."""
+    parts = _parts(_dir(asset, tf, model))
+    if not parts:
+        raise FileNotFoundError(_dir(asset, tf, model))
+    filters = []
+    if start is not None:
+        filters.append(("time", ">=", _utc(start)))
+    if end is not None:
+        filters.append(("time", "<", _utc(end)))
+    tables = [pq.read_table(p, filters=filters or None, schema=SCHEMA) for p in parts]
+    df = pa.concat_tables(tables).to_pandas()
+    if len(parts) > 1:
+        df = df.drop_duplicates("time", keep="last").sort_values("time")
+    return df.reset_index(drop=True)
+
+def compact(asset: str, tf: str, model: str) -> None:
+    """
+    A part-fájlok összefésülése egyetlen fájlba (sok kis append után). Előbb az
+    összefésült fájl kerül a végleges helyére (part-000000), csak utána törlődnek
+    a többi partok: egy közbeni hiba után is minden sor megvan (az olvasás dedupol).
+    """
+    d = _dir(asset, tf, model)
+    parts = _parts(d)
+    if len(parts) < 2:
+        return
+    table = _to_table(read_signals(asset, tf, model))
+    out = d / "part-000000.parquet"
+    tmp = d / "compact.tmp"
+    pq.write_table(table, tmp)
+    tmp.replace(out)
+    for p in parts:
+        if p != out:
+            p.unlink()
+
+def export_csv(asset: str, tf: str, model: str, path: Optional[pathlib.Path] = None) -> pathlib.Path:
+    """Opcionális CSV export (a régi reports/signals_*.csv formátumban)."""
+    path = path or REPORTS_DIR / f"signals_{asset}_{tf}_{model}.csv"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    read_signals(asset, tf, model).to_csv(path, index=False)
+    return path
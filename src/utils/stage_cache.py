@@ -0,0 +1,338 @@
+# src/utils/stage_cache.py
+# Tartalom-címzett stage-eredmény cache a pipeline-hoz.
+# Minden stage deklarálja a bemeneteit (fájl-ujjlenyomatok, config kulcsok,
+# kódverzió = a stage belépő moduljának és minden tranzitívan importált `src`
+# moduljának hash-e); a kimeneti fájlok és a stdout a bemenetek hash-e alatt
+# tárolódnak. Változatlan asset×tf job -> cache hit.
+from __future__ import annotations
+import ast
+import hashlib
+import json
+import pathlib
+import shutil
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from loguru import logger
+
+CACHE_DIR = pathlib.Path(".cache/stages")
+_DIGESTS = "_digests.json"
+
+def _module_file(name: str, src: pathlib.Path) -> Optional[pathlib.Path]:
+    """"src.a.b" vagy "a.b" (PYTHONPATH=src) -> src/a/b.py | src/a/b/__init__.py, ha a fában van."""
+    parts = name.split(".")
+    if parts[0] == src.name:
+        parts = parts[1:]
+    if not parts:
+        return src / "__init__.py"
+    base = src.joinpath(*parts)
+    for p in (base.with_suffix(".py"), base / "__init__.py"):
+        if p.is_file():
+            return p
+    return None
+
+def _imported_names(path: pathlib.Path, src: pathlib.Path) -> Set[str]:
+    tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+    pkg = path.parent.relative_to(src.parent).parts
+    names: Set[str] = set()
+    for node in ast.walk(tree):              # függvényen belüli (lusta) importok is
+        if isinstance(node, ast.Import):
+            names.update(a.name for a in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                up = pkg[: len(pkg) - node.level + 1]
+                base = ".".join([*up, base] if base else up)
+            names.add(base)
+            names.update(f"{base}.{a.name}" for a in node.names)
+    return names
+
+def module_closure(entries: Iterable[pathlib.Path], src: pathlib.Path) -> List[pathlib.Path]:
+    """
+    A belépő modulok és az általuk tranzitívan importált, `src` fán belüli modulok
+    (plusz a csomagok __init__.py-ja) rendezett listája -> kódverzió a cache-kulcsba.
+    Bármelyik függőség módosítása így az összes ráépülő stage-et érvényteleníti.
+    """
+    src = pathlib.Path(src)
+    seen: Set[pathlib.Path] = set()
+    todo = [pathlib.Path(e) for e in entries]
+    while todo:
+        p = todo.pop()
+        if p in seen or not p.is_file():
+            continue
+        seen.add(p)
+        for d in p.relative_to(src).parents:
+            init = src / d / "__init__.py"
+            if init.is_file():
+                todo.append(init)
+        for name in _imported_names(p, src):
+            f = _module_file(name, src)
+            if f is not None:
+                todo.append(f)
+    return sorted(seen)
+
+def output_state(stage: "Stage") -> List[Optional[Tuple[int, int]]]:
+    """A kimenetek (mtime_ns, size) állapota, None ha hiányzik -> futás előtt/után összevetni."""
+    res = []
+    for o in stage.outputs:
+        try:
+            st = pathlib.Path(o).stat()
+        except FileNotFoundError:
+            res.append(None)
+            continue
+        res.append((st.st_mtime_ns, st.st_size))
+    return res
+
+def rewrote_outputs(stage: "Stage", before: List[Optional[Tuple[int, int]]]) -> bool:
+    """Minden kimenet létezik ÉS a futás során újraíródott (nem egy korábbi futás maradéka)."""
+    after = output_state(stage)
+    return all(a is not None and a != b for a, b in zip(after, before))
+
+@dataclass
+class Stage:
+    name: str
+    inputs: List[pathlib.Path] = field(default_factory=list)
+    config: Dict = field(default_factory=dict)
+    code: List[pathlib.Path] = field(default_factory=list)
+    outputs: List[pathlib.Path] = field(default_factory=list)
+    # helyben módosító stage (pl. merge_news): a kimenet egyben a bemenet,
+    # ezért a futás utáni állapotra is felveszünk egy aliast
+    idempotent: bool = False
+    # False: a kimenetekről csak tartalom-hash kerül a cache-be, másolat nem (nagy,
+    # helyben frissülő fájlok, pl. a teljes features/); hit csak egyező kimenetekkel
+    snapshot: bool = True
+
+class StageCache:
+    def __init__(self, root: pathlib.Path = CACHE_DIR, max_bytes: int = 2 * 1024**3,
+                 max_age_days: float = 30.0):
+        self.root = pathlib.Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self._digests: Dict[str, List] = {}
+        p = self.root / _DIGESTS
+        if p.exists():
+            try:
+                self._digests = json.loads(p.read_text(encoding="utf-8"))
+            except Exception:
+                self._digests = {}
+
+    # ---- kulcsképzés ----
+    def file_digest(self, p: pathlib.Path) -> str:
+        """sha256 a tartalomra; (mtime_ns, size) szerint memoizálva, futások között is."""
+        p = pathlib.Path(p)
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            return "missing"
+        k = str(p.resolve())
+        hit = self._digests.get(k)
+        if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            return hit[2]
+        h = hashlib.sha256()
+        with open(p, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        self._digests[k] = [st.st_mtime_ns, st.st_size, h.hexdigest()]
+        return h.hexdigest()
+
+    def key(self, stage: Stage) -> str:
+        payload = {
+            "stage": stage.name,
+            "inputs": [[str(p), self.file_digest(p)] for p in stage.inputs],
+            "config": stage.config,
+            "code": [[str(p), self.file_digest(p)] for p in stage.code],
+            "outputs": [str(p) for p in stage.outputs],
+        }
+        raw = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def save_digests(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / _DIGESTS).write_text(json.dumps(self._digests), encoding="utf-8")
+
+    # ---- bejegyzések ----
+    def _entry(self, key: str) -> pathlib.Path:
+        return self.root / key[:2] / key
+
+    def _meta(self, key: str) -> Optional[Dict]:
+        p = self._entry(key) / "meta.json"
+        if not p.exists():
+            return None
+        meta = json.loads(p.read_text(encoding="utf-8"))
+        if "alias_of" in meta:
+            target = self._meta(meta["alias_of"])
+            if target is None:
+                return None
+            return {**target, "_dir": str(self._entry(meta["alias_of"]))}
+        return {**meta, "_dir": str(self._entry(key))}
+
+    def lookup(self, stage: Stage) -> Tuple[str, Optional[Dict]]:
+        k = self.key(stage)
+        meta = self._meta(k)
+        if meta is not None and not meta.get("snapshot", True):
+            # másolat nélkül nincs mit visszaállítani: hit csak a tárolt állapotú kimenetekkel
+            if any(self.file_digest(o) != d for o, d in zip(meta["outputs"], meta["digests"])):
+                meta = None
+        return k, meta
+
+    def _touch(self, meta: Dict) -> None:
+        d = pathlib.Path(meta["_dir"])
+        meta = {k: v for k, v in meta.items() if k != "_dir"}
+        meta["last_used"] = time.time()
+        (d / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    def restore(self, meta: Dict) -> str:
+        d = pathlib.Path(meta["_dir"])
+        for i, out in enumerate(meta["outputs"]):
+            src = d / "files" / str(i)
+            dst = pathlib.Path(out)
+            if src.exists() and self.file_digest(dst) != meta["digests"][i]:
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(src, dst)
+        self._touch(meta)
+        return meta.get("stdout", "")
+
+    def store(self, stage: Stage, key: str, stdout: str) -> None:
+        d = self._entry(key)
+        tmp = d.with_name(d.name + ".tmp")
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        (tmp / "files").mkdir(parents=True)
+        digests, size = [], 0
+        for i, out in enumerate(stage.outputs):
+            out = pathlib.Path(out)
+            digests.append(self.file_digest(out))
+            if stage.snapshot and out.exists():
+                shutil.copy2(out, tmp / "files" / str(i))
+                size += out.stat().st_size
+        now = time.time()
+        meta = {"stage": stage.name, "created": now, "last_used": now, "size": size,
+                "outputs": [str(p) for p in stage.outputs], "digests": digests, "stdout": stdout,
+                "snapshot": stage.snapshot}
+        (tmp / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        if d.exists():
+            shutil.rmtree(d)
+        tmp.replace(d)
+
+        if stage.idempotent:
+            post = self.key(stage)
+            if post != key:
+                a = self._entry(post)
+                a.mkdir(parents=True, exist_ok=True)
+                (a / "meta.json").write_text(json.dumps({"alias_of": key, "created": now}),
+                                             encoding="utf-8")
+
+    def run(self, stage: Stage, fn: Callable[[], str], dry_run: bool = False) -> Tuple[str, str]:
+        """
+        Visszaad: (status, stdout), status: "hit" | "miss" | "would-run".
+        dry_run: csak megmondja, mi futna újra (semmit nem ír vissza).
+        """
+        key, meta = self.lookup(stage)
+        if meta is not None:
+            if dry_run:
+                return "hit", meta.get("stdout", "")
+            logger.info(f"cache hit: {stage.name} [{key[:12]}]")
+            return "hit", self.restore(meta)
+        if dry_run:
+            return "would-run", ""
+        out = fn()
+        self.store(stage, key, out)
+        self.save_digests()
+        return "miss", out
+
+    def run_many(self, stages: List[Stage], fn: Callable[[List[Stage]], str],
+                 dry_run: bool = False) -> List[str]:
+        """
+        Több stage egy hívásban (pl. párhuzamos tanítás): a találatok visszaállítva,
+        a miss-ek listájával fn EGYSZER fut, majd stage-enként tárolódnak. Visszaad: statusok.
+        """
+        keys, misses, status = [], [], []
+        for st in stages:
+            key, meta = self.lookup(st)
+            keys.append(key)
+            if meta is not None:
+                if not dry_run:
+                    logger.info(f"cache hit: {st.name} [{key[:12]}]")
+                    self.restore(meta)
+                status.append("hit")
+            else:
+                misses.append(len(keys) - 1)
+                status.append("would-run" if dry_run else "miss")
+        if misses and not dry_run:
+            before = {i: output_state(stages[i]) for i in misses}
+            out = fn([stages[i] for i in misses])
+            for i in misses:
+                # részleges siker: csak a most (újra)írt kimenetű stage-et cache-eljük,
+                # egy korábbi futásból ott maradt artefaktot nem
+                if rewrote_outputs(stages[i], before[i]):
+                    self.store(stages[i], keys[i], out)
+                else:
+                    status[i] = "failed"
+            self.save_digests()
+        return status
+
+    # ---- karbantartás ----
+    def _entries(self) -> List[Tuple[pathlib.Path, Dict]]:
+        res = []
+        if not self.root.exists():
+            return res
+        for m in self.root.glob("??/*/meta.json"):
+            try:
+                res.append((m.parent, json.loads(m.read_text(encoding="utf-8"))))
+            except Exception:
+                res.append((m.parent, {}))
+        return res
+
+    def evict(self) -> int:
+        """Kor (max_age_days) és méret (max_bytes, LRU) szerinti takarítás. Visszaad: törölt bejegyzések."""
+        now = time.time()
+        entries = [(d, m) for d, m in self._entries() if "alias_of" not in m]
+        removed = 0
+        keep = []
+        for d, m in entries:
+            if now - m.get("last_used", 0) > self.max_age_days * 86400:
+                shutil.rmtree(d, ignore_errors=True)
+                removed += 1
+            else:
+                keep.append((d, m))
+        keep.sort(key=lambda e: e[1].get("last_used", 0))
+        total = sum(m.get("size", 0) for _, m in keep)
+        while keep and total > self.max_bytes:
+            d, m = keep.pop(0)
+            shutil.rmtree(d, ignore_errors=True)
+            total -= m.get("size", 0)
+            removed += 1
+        # árva aliasok
+        for d, m in self._entries():
+            if "alias_of" in m and not self._entry(m["alias_of"]).exists():
+                shutil.rmtree(d, ignore_errors=True)
+        if removed:
+            logger.info(f"Stage cache evicted {removed} entries")
+        return removed
+
+    def stats(self) -> Dict:
+        entries = [m for _, m in self._entries() if "alias_of" not in m]
+        return {"entries": len(entries), "bytes": sum(m.get("size", 0) for m in entries)}
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+        self._digests = {}
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stats", action="store_true")
+    ap.add_argument("--evict", action="store_true")
+    ap.add_argument("--clear", action="store_true")
+    ap.add_argument("--max_gb", type=float, default=2.0)
+    ap.add_argument("--max_age_days", type=float, default=30.0)
+    args = ap.parse_args()
+    cache = StageCache(max_bytes=int(args.max_gb * 1024**3), max_age_days=args.max_age_days)
+    if args.clear:
+        cache.clear()
+    if args.evict:
+        cache.evict()
+    print(cache.stats())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# src/viz/downsample.py
+# Nagy history rajzolásához: OHLC bucket-aggregálás a gyertyákhoz és LTTB
+# (Largest-Triangle-Three-Buckets) a vonalakhoz (equity, indikátorok).
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+def ohlc_buckets(df: pd.DataFrame, max_bars: int) -> pd.DataFrame:
+    """
+    Egymást követő barok összevonása legfeljebb `max_bars` gyertyába:
+    open = első, high = max, low = min, close = utolsó, volume = összeg, time = első.
+    """
+    n = len(df)
+    if max_bars <= 0 or n <= max_bars:
+        return df
+    bucket = np.arange(n) * max_bars // n
+    starts = np.flatnonzero(np.diff(bucket, prepend=-1))
+    ends = np.append(starts[1:], n) - 1
+    out = {
+        "time": df["time"].to_numpy()[starts],
+        "open": df["open"].to_numpy()[starts],
+        "high": np.maximum.reduceat(df["high"].to_numpy(dtype=float), starts),
+        "low": np.minimum.reduceat(df["low"].to_numpy(dtype=float), starts),
+        "close": df["close"].to_numpy()[ends],
+    }
+    if "volume" in df.columns:
+        out["volume"] = np.add.reduceat(df["volume"].to_numpy(dtype=float), starts)
+    res = pd.DataFrame(out)
+    res["time"] = pd.to_datetime(res["time"], utc=True)
+    return res
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    LTTB: a megtartandó pontok indexei (az első és utolsó mindig benne van).
+    Bucketenként az a pont marad, amelyik az előzőleg kiválasztott ponttal és a
+    következő bucket átlagával a legnagyobb háromszöget adja -> a vonal alakja
+    (csúcsok, völgyek) megmarad, a pontszám a viewporthoz igazodik.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        nhi = max(nhi, nlo + 1)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        idx[i + 1] = a
+    return idx
+
+def lttb_series(s: pd.Series, n_out: int) -> pd.Series:
+    """LTTB egy datetime indexű sorozatra."""
+    if len(s) <= n_out:
+        return s
+    x = s.index.asi8 if isinstance(s.index, pd.DatetimeIndex) else np.arange(len(s))
+    return s.iloc[lttb(x, s.to_numpy(dtype=np.float64), n_out)]
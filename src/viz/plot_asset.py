@@ -1,65 +1,161 @@
 # src/viz/plot_asset.py
 from __future__ import annotations
 import pathlib
+from typing import List, Optional, Tuple
 import pandas as pd
 import plotly.graph_objects as go
+import yaml
+from plotly.subplots import make_subplots
 from loguru import logger
 
+from src.backtest.results_db import DB_PATH, query_runs
+from src.backtest.simple_bt import run_backtest
+from src.signals.store import read_signals
+from src.viz.downsample import lttb_series, ohlc_buckets
+
 RAW_DIR = pathlib.Path("data/raw")
 FEAT_DIR = pathlib.Path("data/features")
 REPORTS_DIR = pathlib.Path("reports")
+CFG_PATH = pathlib.Path("config.yaml")
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
+# ~ egy képernyőnyi szélesség pixelben: ennél több pontot úgysem lát a böngésző
+MAX_POINTS = 2000
+
 def _read_raw(asset: str, tf: str) -> pd.DataFrame:
     p = RAW_DIR / f"{asset}_{tf}.parquet"
     if not p.exists():
         raise FileNotFoundError(p)
     df = pd.read_parquet(p)
-    df["time"] = pd.to_datetime(df["time"], utc=True)
+    # egységes ns egység: a raw fájl lehet ms/ns, a jel-tár us -> merge_asof kulcsok egyezzenek
+    df["time"] = pd.to_datetime(df["time"], utc=True).astype("datetime64[ns, UTC]")
     return df
 
 def _read_signals(asset: str, tf: str, model: str) -> pd.DataFrame:
-    p = REPORTS_DIR / f"signals_{asset}_{tf}_{model}.csv"
-    if not p.exists():
-        raise FileNotFoundError(p)
-    df = pd.read_csv(p)
-    df["time"] = pd.to_datetime(df["time"], utc=True)
-    return df
+    # jel-tár: típusos int8 jel, float32 confidence, nincs CSV parse
+    sig = read_signals(asset, tf, model)
+    sig["time"] = sig["time"].astype("datetime64[ns, UTC]")
+    return sig
+
+def _bt_params(asset: str, tf: str, model: str) -> Tuple[float, float]:
+    """
+    (fee_bps, hold) az equity panelhez: a legutóbbi tuning futás rekordjából
+    (results DB), ha nincs, a config.yaml-ból (pipeline alapértékek: 1.0 / 0.40).
+    """
+    if DB_PATH.exists():
+        rec = query_runs("tune", limit=1, asset=asset, tf=tf, model=model)
+        if not rec.empty and rec[["fee_bps", "hold"]].notna().all(axis=None):
+            return float(rec["fee_bps"].iloc[0]), float(rec["hold"].iloc[0])
+    cfg = {}
+    if CFG_PATH.exists():
+        with open(CFG_PATH, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+    return float(cfg.get("fee_bps", 1.0)), float(cfg.get("hold", 0.40))
 
-def plot_with_signals(asset: str, tf: str, model: str = "logreg") -> pathlib.Path:
-    price = _read_raw(asset, tf)
+def _build_figure(asset: str, tf: str, model: str, max_points: Optional[int],
+                  fee_bps: Optional[float] = None, hold: Optional[float] = None) -> go.Figure:
+    if fee_bps is None or hold is None:
+        d_fee, d_hold = _bt_params(asset, tf, model)
+        fee_bps = d_fee if fee_bps is None else fee_bps
+        hold = d_hold if hold is None else hold
+    price = _read_raw(asset, tf).dropna(subset=["time"]).sort_values("time").reset_index(drop=True)
     sig = _read_signals(asset, tf, model)
 
-    fig = go.Figure()
+    # BUY / SELL markerek (a jelhez tartozó bar close-ján)
+    sig = pd.merge_asof(sig.sort_values("time"), price[["time", "close"]],
+                        on="time", direction="backward")
+
+    # equity a teljes felbontáson számolva, rajzoláshoz LTTB-vel ritkítva
+    bt = sig.dropna(subset=["close"]).set_index("time")
+    equity = run_backtest(bt, signal_col="signal", fee_bps=fee_bps, hold=hold)["equity_curve"]
+
+    candles = price
+    if max_points:
+        candles = ohlc_buckets(price, max_points)
+        equity = lttb_series(equity, max_points)
+
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.75, 0.25],
+                        vertical_spacing=0.03)
     fig.add_trace(go.Candlestick(
-        x=price["time"], open=price["open"], high=price["high"],
-        low=price["low"], close=price["close"], name="Price"
-    ))
-    # BUY / SELL markerek
-    buys = sig[sig["signal"] == "BUY"]
-    sells = sig[sig["signal"] == "SELL"]
-    fig.add_trace(go.Scatter(x=buys["time"], y=buys["close"], mode="markers",
-                             marker_symbol="triangle-up", marker_size=10, name="BUY"))
-    fig.add_trace(go.Scatter(x=sells["time"], y=sells["close"], mode="markers",
-                             marker_symbol="triangle-down", marker_size=10, name="SELL"))
+        x=candles["time"], open=candles["open"], high=candles["high"],
+        low=candles["low"], close=candles["close"], name="Price"
+    ), row=1, col=1)
+    # sok marker -> WebGL (Scattergl), nem SVG
+    buys = sig[sig["signal"] == 1]
+    sells = sig[sig["signal"] == -1]
+    fig.add_trace(go.Scattergl(x=buys["time"], y=buys["close"], mode="markers",
+                               marker_symbol="triangle-up", marker_size=8, name="BUY"),
+                  row=1, col=1)
+    fig.add_trace(go.Scattergl(x=sells["time"], y=sells["close"], mode="markers",
+                               marker_symbol="triangle-down", marker_size=8, name="SELL"),
+                  row=1, col=1)
+    fig.add_trace(go.Scattergl(x=equity.index, y=equity.to_numpy(), mode="lines", name="Equity"),
+                  row=2, col=1)
 
     fig.update_layout(title=f"{asset} {tf} – {model} signals",
-                      xaxis_title="time", yaxis_title="price",
                       xaxis_rangeslider_visible=False)
+    fig.update_yaxes(title_text="price", row=1, col=1)
+    fig.update_yaxes(title_text="equity", row=2, col=1)
+    fig.update_xaxes(title_text="time", row=2, col=1)
+    return fig
 
+def plot_with_signals(asset: str, tf: str, model: str = "logreg",
+                      max_points: Optional[int] = MAX_POINTS, fee_bps: Optional[float] = None,
+                      hold: Optional[float] = None) -> pathlib.Path:
+    """
+    Ár + jelek + equity. max_points: a gyertyák/vonalak pontszáma (viewport);
+    None/0 -> minden nyers bar. A plotly.js egyszer, a reports/ mappában van
+    (include_plotlyjs="directory"), nem minden HTML-be ágyazva.
+    fee_bps/hold: None -> tuning rekord, ill. config (_bt_params).
+    """
+    fig = _build_figure(asset, tf, model, max_points, fee_bps, hold)
     out = REPORTS_DIR / f"plot_{asset}_{tf}_{model}.html"
-    fig.write_html(out)
+    fig.write_html(out, include_plotlyjs="directory")
     logger.info(f"Saved plot -> {out}")
     return out
 
+def plot_dashboard(pairs: List[Tuple[str, str]], model: str = "logreg",
+                   max_points: Optional[int] = MAX_POINTS, fee_bps: Optional[float] = None,
+                   hold: Optional[float] = None) -> pathlib.Path:
+    """Több asset egy HTML-ben, egyetlen beágyazott plotly.js bundle-lel."""
+    divs = []
+    for asset, tf in pairs:
+        try:
+            fig = _build_figure(asset, tf, model, max_points, fee_bps, hold)
+        except FileNotFoundError as e:
+            logger.warning(f"Skip dashboard panel {asset} {tf}: {e}")
+            continue
+        divs.append(fig.to_html(full_html=False, include_plotlyjs=not divs,
+                                default_height="720px"))
+    out = REPORTS_DIR / f"dashboard_{model}.html"
+    html = ("<html><head><meta charset=\"utf-8\"><title>QuantBrain – "
+            f"{model}</title></head><body>" + "\n".join(divs) + "</body></html>")
+    out.write_text(html, encoding="utf-8")
+    logger.info(f"Saved dashboard ({len(divs)} panels) -> {out}")
+    return out
+
 def main():
     import argparse
     ap = argparse.ArgumentParser()
-    ap.add_argument("--asset", required=True)
-    ap.add_argument("--tf", required=True)
+    ap.add_argument("--asset")
+    ap.add_argument("--tf")
     ap.add_argument("--model", choices=["logreg","rf"], default="logreg")
+    ap.add_argument("--max_points", type=int, default=MAX_POINTS,
+                    help="gyertyák/vonalpontok max. száma (0 = teljes felbontás)")
+    ap.add_argument("--fee_bps", type=float, default=None,
+                    help="equity panel díja (alapértelmezés: tuning rekord / config)")
+    ap.add_argument("--hold", type=float, default=None,
+                    help="equity panel hold küszöbe (alapértelmezés: tuning rekord / config)")
+    ap.add_argument("--dashboard", action="store_true",
+                    help="minden konfigurált asset×tf egy HTML-ben")
     args = ap.parse_args()
-    plot_with_signals(args.asset, args.tf, args.model)
+    if args.dashboard:
+        from src.signals.generate import _configured_pairs
+        plot_dashboard(_configured_pairs(), args.model, args.max_points, args.fee_bps, args.hold)
+        return
+    if not args.asset or not args.tf:
+        ap.error("--asset and --tf are required unless --dashboard is given")
+    plot_with_signals(args.asset, args.tf, args.model, args.max_points, args.fee_bps, args.hold)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,45 @@
+# tests/test_build_dataset.py
+# A chunkolt (streaming) feature-építés kimenete egyezik a memóriabeli builddel,
+# az OBV újrahorgonyzásával együtt a chunkhatárokon.
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pandas_ta")
+
+from src.features import build_dataset as bd
+from src.features.labels import LabelSpec
+
+N_ROWS = 3000
+CHUNK = 700
+
+def _write_raw(path, n: int = N_ROWS, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    spread = np.abs(rng.normal(0, 0.5, n))
+    df = pd.DataFrame({
+        "time": pd.date_range("2020-01-01", periods=n, freq="4h", tz="UTC"),
+        "open": close, "high": close + spread, "low": close - spread,
+        "close": close, "volume": rng.uniform(1, 10, n),
+    })
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # kis row groupok: a batch-olvasás valóban több chunkra bont
+    df.to_parquet(path, index=False, row_group_size=CHUNK)
+    return df
+
+@pytest.mark.parametrize("labels", [None, LabelSpec(horizons=(1, 3), max_hold=6)])
+def test_streaming_matches_in_memory(tmp_path, monkeypatch, labels):
+    monkeypatch.chdir(tmp_path)
+    _write_raw(bd.RAW_DIR / "BTCUSDT_4h.parquet")
+
+    full = bd.build_features_for("BTCUSDT", "4h", labels=labels)
+    chunks = list(bd.iter_features_for("BTCUSDT", "4h", chunk_rows=CHUNK,
+                                       warmup_rows=400, labels=labels))
+    assert len(chunks) > 2
+    stream = pd.concat(chunks, ignore_index=True)
+
+    pd.testing.assert_frame_equal(stream, full, rtol=1e-7)
+    # OBV: a chunkhatár utáni sor a teljes történet kumulált értékét folytatja
+    edge = len(chunks[0])
+    np.testing.assert_allclose(stream["obv"].iloc[edge - 1:edge + 1], full["obv"].iloc[edge - 1:edge + 1],
+                               rtol=1e-12)
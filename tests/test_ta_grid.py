@@ -0,0 +1,60 @@
+# tests/test_ta_grid.py
+# A NumPy indikátor-rács összevetése a pandas referenciával, hiányos (NaN) OHLC sorokkal.
+import numpy as np
+import pandas as pd
+
+from src.features.ta_grid import GridSpec, grid_frame
+
+SPEC = GridSpec(sma=(5, 20, 50), ema=(5, 50), rsi=(2, 14), atr=(2, 14), ret_lags=(1, 5))
+
+def _ohlc(n: int = 3000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    spread = np.abs(rng.normal(0, 0.5, n))
+    df = pd.DataFrame({
+        "time": pd.date_range("2020-01-01", periods=n, freq="4h", tz="UTC"),
+        "open": close, "high": close + spread, "low": close - spread,
+        "close": close, "volume": rng.uniform(1, 10, n),
+    })
+    for col, rows in (("close", [10, 700, 701, 2500]), ("high", [1200]), ("low", [1900])):
+        df.loc[rows, col] = np.nan
+    return df.sample(frac=1.0, random_state=1)      # rendezetlen bemenet is
+
+def _reference(df: pd.DataFrame, spec: GridSpec) -> pd.DataFrame:
+    df = df.dropna(subset=["time", "high", "low", "close"]).sort_values("time").reset_index(drop=True)
+    c, h, l = df["close"], df["high"], df["low"]
+    out = {}
+    for n in spec.sma:
+        out[f"sma{n}"] = c.rolling(n).mean()
+    for n in spec.ema:
+        out[f"ema{n}"] = c.ewm(span=n, adjust=False, min_periods=n).mean()
+    d = c.diff()
+    for n in spec.rsi:
+        g = d.clip(lower=0).ewm(alpha=1 / n, adjust=False, min_periods=n).mean()
+        ls = (-d).clip(lower=0).ewm(alpha=1 / n, adjust=False, min_periods=n).mean()
+        out[f"rsi{n}"] = 100 * g / (g + ls)
+    pc = c.shift(1)
+    tr = pd.concat([h - l, (h - pc).abs(), (l - pc).abs()], axis=1).max(axis=1, skipna=False)
+    for n in spec.atr:
+        out[f"atr{n}"] = tr.ewm(alpha=1 / n, adjust=False, min_periods=n).mean()
+    for n in spec.ret_lags:
+        out[f"ret_{n}"] = c / c.shift(n) - 1
+    return pd.DataFrame({"time": df["time"], **out})
+
+def test_grid_matches_pandas_with_nan_rows():
+    df = _ohlc()
+    got = grid_frame(df, SPEC)
+    ref = _reference(df, SPEC)
+    assert len(got) == len(df) - 6
+    assert got["time"].is_monotonic_increasing
+    pd.testing.assert_series_equal(got["time"], ref["time"])
+    for name in SPEC.names():
+        g, r = got[name].to_numpy(np.float64), ref[name].to_numpy(np.float64)
+        assert np.array_equal(np.isnan(g), np.isnan(r)), name
+        ok = ~np.isnan(r)
+        np.testing.assert_allclose(g[ok], r[ok], rtol=1e-5, atol=1e-4, err_msg=name)
+
+def test_grid_nan_count_bounded_by_warmup():
+    got = grid_frame(_ohlc(), SPEC)
+    assert got["sma50"].isna().sum() == 49
+    assert got["ema50"].notna().any()